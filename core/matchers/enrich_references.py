@@ -1,130 +1,197 @@
 import argparse
+import collections
+import functools
+import itertools
 import logging
 import magic
-import re
+import multiprocessing as mp
 import os
+import re
+import time
 
-from scielo_scholarly_data import standardizer
+from core.util import cached_standardizer as standardizer
+from core.util import checkpoint
 from core.util import file
+from core.util import json_backend
+from core.util import profiling
+from core.util import sidecar
+from core.util import snapshot
+from core.util import stream
+from core.util.mmap_index import YearVolumeIndex
+from core.util.cache import LRUCache
 from core.model.citation import Citation
-from result_code import *
+from core.model.match_manager import DEFAULT_STAGE_ORDER, HomonymTable, MatchManager, exact_disambiguation_stages, match_year_volume, match_year_volume_inferred
+from core.model.title_index import TitleIndex
+from core.matchers.metrics import EnrichmentMetrics, save_metrics
+from core.matchers.result_code import *
 
 
 DEFAULT_CHARSET = os.environ.get('DEFAULT_CHARSET', 'utf-8')
 LOGGING_LEVEL = os.environ.get('LOGGING_LEVEL', logging.INFO)
-MIN_WORD_LENGTH = int(os.environ.get('MIN_WORD_LENGTH', '2'))
-MIN_TITLE_LENGTH = int(os.environ.get('MIN_TITLE_LENGTH', '6'))
-MIN_WORDS_NUMBER = int(os.environ.get('MIN_WORDS_NUMBER', '2'))
-MIN_COMPARABLE_WORDS_NUMBER = int(os.environ.get('MIN_COMPARABLE_WORDS_NUMBER', '2'))
+RESULT_CACHE_SIZE = int(os.environ.get('RESULT_CACHE_SIZE', '100000'))
+ENRICH_CHUNK_SIZE = int(os.environ.get('ENRICH_CHUNK_SIZE', '1000'))
+CHECKPOINT_INTERVAL = int(os.environ.get('CHECKPOINT_INTERVAL', '100000'))
+ENCODING_SAMPLE_SIZE = int(os.environ.get('ENCODING_SAMPLE_SIZE', str(1024 * 1024)))
 
+# Chave cited_issnl em uma linha JSON (precedida de { ou ,), detectada sem ler a citação
+PREVIOUS_RESULT_PATTERN = re.compile(r'[{,]\s*"cited_issnl"\s*:')
 
-def fuzzy_match(title: str, data: dict, standardize=False):
-    words = title.split(' ')
+# Motor de enriquecimento (bases de correção incluídas) herdado pelos processos filhos via fork
+_shared = {'engine': None}
 
-    if standardize:
-        cleaned_title = standardizer.journal_title_for_deduplication(title).upper()
-    else:
-        cleaned_title = title
+# Codificações já detectadas, por arquivo (caminho, tamanho e data de modificação)
+_encoding_cache = {}
 
-    valid_words = [w for w in words if len(w) >= MIN_WORD_LENGTH]
 
-    if len(cleaned_title) >= MIN_TITLE_LENGTH and len(words) >= MIN_WORDS_NUMBER and len(valid_words) >= MIN_COMPARABLE_WORDS_NUMBER:
-        pattern = r'[\w|\s]*'.join([word for word in words]) + '[\w|\s]*'
+def clean_previous_results(citation):
+    for pv in ['result', 'result_code', 'cited_issnl']:
+        try:
+            del citation.__dict__[pv]
+        except KeyError:
+            ...
 
-        title_pattern = re.compile(pattern, re.UNICODE)
 
-        fuzzy_matches = []
+# Campo ausente na citação
+_MISSING = object()
 
-        for oficial_title in [ot for ot in data.keys() if ot.startswith(words[0])]:
-            match = title_pattern.fullmatch(oficial_title)
 
-            if match:
-                fuzzy_matches.extend(data[oficial_title].split('#'))
+def extract_raw_data(citation):
+    fields = citation.__dict__
+    return fields.get('cited_journal', _MISSING), fields.get('cited_source', _MISSING), fields.get('cited_year', _MISSING), fields.get('cited_vol', _MISSING)
 
-        return set(fuzzy_matches)
 
-    return set()
+def standardize_journal_title(title):
+    if title is _MISSING:
+        return ''
 
+    try:
+        return standardizer.journal_title_for_deduplication(title).upper()
+    except AttributeError:
+        return ''
 
-def infer_volume(issn: str, year: int, data: dict):
-    if issn in data:
-        a, b = data[issn]
-        return round(a + (b * year))
 
+def standardize_essential_data(journal, source, year, volume):
+    """
+    Normaliza os campos brutos de extract_raw_data no trio título-ano-volume; o título da fonte substitui o do periódico vazio.
+    """
+    cited_journal_title_cleaned = standardize_journal_title(journal)
 
-def get_issns_list_sign(issn_list):
-    return '#'.join(sorted(issn_list))
+    if not cited_journal_title_cleaned:
+        cited_journal_title_cleaned = standardize_journal_title(source)
 
+    cited_year_cleaned = ''
+    if year is not _MISSING:
+        try:
+            cited_year_cleaned = str(standardizer.document_publication_date(year, only_year=True))
+        except Exception:
+            ...
 
-def clean_previous_results(citation):
-    for pv in ['result', 'result_code', 'cited_issnl']:
+    cited_volume_cleaned = ''
+    if volume is not _MISSING:
         try:
-            del citation.__dict__[pv]
-        except KeyError:
+            cited_volume_cleaned = standardizer.issue_volume(volume)
+        except Exception:
             ...
 
+    return cited_journal_title_cleaned, cited_year_cleaned, cited_volume_cleaned
+
 
 def extract_essential_data(citation):
-    try:                    
-        cited_journal_title_cleaned = standardizer.journal_title_for_deduplication(citation.cited_journal).upper()
-    except AttributeError:
-        cited_journal_title_cleaned = ''
+    return standardize_essential_data(*extract_raw_data(citation))
 
-    if not cited_journal_title_cleaned:
-        try:
-            cited_journal_title_cleaned = standardizer.journal_title_for_deduplication(citation.cited_source).upper()
-        except AttributeError:
-            cited_journal_title_cleaned = ''
 
-    try:
-        cited_year_cleaned = str(standardizer.document_publication_date(citation.cited_year, only_year=True))
-    except Exception:
-        cited_year_cleaned = ''
+def read_sample(fin, sample_size):
+    sample = fin.read(sample_size)
 
-    try:
-        cited_volume_cleaned = standardizer.issue_volume(citation.cited_vol)
-    except Exception:
-        cited_volume_cleaned = ''
+    # Descarta a última linha, possivelmente incompleta, para não dividir caracteres multibyte
+    if len(sample) == sample_size:
+        sample = sample[:sample.rfind(b'\n') + 1] or sample
 
-    return cited_journal_title_cleaned, cited_year_cleaned, cited_volume_cleaned
+    return sample
 
 
-def get_titles(issn_list, issn2titles):
-    titles = set()
+def read_encoding_sample(path, sample_size=ENCODING_SAMPLE_SIZE):
+    """
+    Lê amostras de até sample_size bytes do início, do meio e do fim de um arquivo, alinhadas a quebras de linha.
+    Arquivos pequenos são lidos inteiramente; arquivos comprimidos, apenas no início.
+    """
+    with stream.open_input_binary(path) as fin:
+        if not stream.is_seekable(path):
+            return read_sample(fin, sample_size)
 
-    for i in issn_list:
-        titles = titles.union(issn2titles.get(i, set()))
+        size = os.fstat(fin.fileno()).st_size
+        if size <= 3 * sample_size:
+            return fin.read()
 
-    return titles
+        samples = [read_sample(fin, sample_size)]
 
+        for offset in [size // 2, size - sample_size]:
+            fin.seek(offset)
 
-def detect_file_encoding(path):
-    m = magic.Magic(mime_encoding=True)
-    
-    with open(path, 'rb') as fin:
-        path_encoding = m.from_buffer(fin.read())
+            # Descarta a linha, possivelmente incompleta, em que a amostra começaria
+            fin.readline(sample_size)
+            samples.append(read_sample(fin, sample_size))
 
-        if path_encoding and path_encoding not in ['binary', 'unknown-8bit']:
-            return path_encoding
+        return b''.join(samples)
 
-    return DEFAULT_CHARSET
 
+def detect_file_encoding(path, sample_size=ENCODING_SAMPLE_SIZE):
+    # Entrada padrão não pode ser lida duas vezes
+    if path == stream.STDIO:
+        return DEFAULT_CHARSET
 
-def gen_output_path(input_directory, input_path, output_path):
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+
+    if key not in _encoding_cache:
+        m = magic.Magic(mime_encoding=True)
+        path_encoding = m.from_buffer(read_encoding_sample(path, sample_size))
+
+        if not path_encoding or path_encoding in ['binary', 'unknown-8bit']:
+            path_encoding = DEFAULT_CHARSET
+
+        _encoding_cache[key] = path_encoding
+
+    return _encoding_cache[key]
+
+
+def gen_output_path(input_directory, input_path, output_path, output_mode='full', resume=False, profile=False):
     if input_directory:
-        base_name = os.path.basename(input_path)
+        # Saída é comprimida no mesmo formato da entrada
+        base_name, compression_ext = stream.split_compression_ext(os.path.basename(input_path))
         file_name, file_ext = os.path.splitext(base_name)
 
-        current_version = 1
-        new_output = os.path.join(input_directory, f'{file_name}.{current_version}.enriched{file_ext}')
-        
-        new_version = current_version
+        # Arquivos sidecar são sempre JSONL
+        suffix = 'enriched'
+        if output_mode == 'sidecar':
+            suffix, file_ext = 'sidecar.enriched', '.jsonl'
+
+        # Saídas parciais do modo --profile não se confundem com arquivos enriquecidos por completo
+        if profile:
+            suffix = 'profile.' + suffix
+
+        file_ext += compression_ext
+
+        new_version = 1
+        new_output = os.path.join(input_directory, f'{file_name}.{new_version}.{suffix}{file_ext}')
+        resumable_output = None
+
         while os.path.exists(new_output):
+            # Com resume, reaproveita a versão mais recente que tenha checkpoint (em andamento ou concluída)
+            if resume and os.path.exists(checkpoint.checkpoint_path(new_output)):
+                resumable_output = new_output
+
             new_version += 1
-            new_output = new_output.replace(f'.{current_version}.enriched', f'.{new_version}.enriched')
-        
-        return new_output
-    
+            new_output = os.path.join(input_directory, f'{file_name}.{new_version}.{suffix}{file_ext}')
+
+        return resumable_output or new_output
+
+    # Saída parcial do modo --profile não sobrescreve a saída de um enriquecimento completo
+    if profile and output_path != '-':
+        base_name, compression_ext = stream.split_compression_ext(output_path)
+        file_name, file_ext = os.path.splitext(base_name)
+        return f'{file_name}.profile{file_ext}{compression_ext}'
+
     return output_path
 
 
@@ -135,7 +202,93 @@ def is_file_to_enrich(file_name):
     return True
 
 
-def enrich(data, format, ignore_previous_result, title2issnl, issn2titles, title_year_volume2issn, artifitial_title_year_volume2issn, issn2equations, use_fuzzy):
+def build_homonym_table(title2issnl, title_year_volume2issn, artifitial_title_year_volume2issn, issn2equations, stage_order=None):
+    """
+    Pré-calcula, para cada título associado a mais de um ISSN-L, as decisões das etapas de desambiguação que seguem
+    a etapa exact em stage_order: por chave título-ano-volume (year_volume e artificial) e por ano com volume inferido
+    (inferred e artificial_inferred). As decisões são consultadas na mesma ordem das etapas.
+    """
+    stages = exact_disambiguation_stages(stage_order or DEFAULT_STAGE_ORDER)
+    homonymous = {t: issnls.split('#') for t, issnls in title2issnl.items() if '#' in issnls}
+
+    # Bases cujas chaves título-ano-volume são consultadas pelas etapas
+    bases = []
+    if {'year_volume', 'inferred', 'artificial'} & set(stages):
+        bases.append(title_year_volume2issn)
+    if {'artificial', 'artificial_inferred'} & set(stages):
+        bases.append(artifitial_title_year_volume2issn)
+
+    # Agrupa as chaves título-ano-volume pelo título homônimo que as prefixa
+    title_to_keys = {}
+    for base in bases:
+        for key in base:
+            pos = key.find('-')
+            while pos >= 0:
+                if key[:pos] in homonymous:
+                    title_to_keys.setdefault(key[:pos], set()).add(key)
+                pos = key.find('-', pos + 1)
+
+    empty_entry = {s: {} for s in stages}
+    homonym_table = HomonymTable(stages)
+
+    for title, issnls in homonymous.items():
+        keys = title_to_keys.get(title)
+        if not keys:
+            homonym_table[title] = empty_entry
+            continue
+
+        issnls_std = [standardizer.journal_issn(i) for i in issnls]
+        entry = {s: {} for s in stages}
+        years = set()
+
+        for key in keys:
+            if 'year_volume' in entry:
+                matched = match_year_volume(key, [title_year_volume2issn], issnls_std, SUCCESS_EXACT_MATCH_YEAR_VOL)
+                if matched:
+                    entry['year_volume'][key] = matched
+
+            if 'artificial' in entry:
+                matched = match_year_volume(key, [artifitial_title_year_volume2issn, title_year_volume2issn], issnls_std, SUCCESS_EXACT_MATCH_YEAR_VOL_ART)
+                if matched:
+                    entry['artificial'][key] = matched
+
+            year = key[len(title) + 1:].split('-', 1)[0]
+            if year.isdigit():
+                years.add(year)
+
+        for year in years:
+            if 'inferred' in entry:
+                matched = match_year_volume_inferred(title, year, issnls, issnls_std, title_year_volume2issn, issn2equations, SUCCESS_EXACT_MATCH_YEAR_VOL_INF, ERROR_EXACT_MATCH_YEAR_VOL_INF)
+                if matched:
+                    entry['inferred'][year] = matched
+
+            if 'artificial_inferred' in entry:
+                matched = match_year_volume_inferred(title, year, issnls, issnls_std, artifitial_title_year_volume2issn, issn2equations, SUCCESS_EXACT_MATCH_YEAR_VOL_INF_ART, ERROR_EXACT_MATCH_YEAR_VOL_INF_ART)
+                if matched:
+                    entry['artificial_inferred'][year] = matched
+
+        homonym_table[title] = entry
+
+    return homonym_table
+
+
+def match_essential_data(cited_journal_title_cleaned, cited_year_cleaned, cited_volume_cleaned, title2issnl, issn2titles, title_year_volume2issn, artifitial_title_year_volume2issn, issn2equations, use_fuzzy, title_index=None, homonym_table=None, match_manager=None):
+    if match_manager is None:
+        match_manager = MatchManager(
+            title2issnl,
+            issn2titles,
+            title_year_volume2issn,
+            artifitial_title_year_volume2issn,
+            issn2equations,
+            use_fuzzy=use_fuzzy,
+            title_index=title_index,
+            homonym_table=homonym_table,
+        )
+
+    return match_manager.match(cited_journal_title_cleaned, cited_year_cleaned, cited_volume_cleaned)
+
+
+def enrich(data, format, ignore_previous_result, title2issnl, issn2titles, title_year_volume2issn, artifitial_title_year_volume2issn, issn2equations, use_fuzzy, title_index=None, cache=None, homonym_table=None, match_manager=None):
     cit = Citation(data, format=format)
 
     # Caso citação já tenha sido tratada e ISSN-L é válido
@@ -147,335 +300,534 @@ def enrich(data, format, ignore_previous_result, title2issnl, issn2titles, title
 
         # Caso haja título de periódico
         if cited_journal_title_cleaned:
-
-            # Caso ocorra correspondência exata entre título de periódico e base de correção
-            if cited_journal_title_cleaned in title2issnl:
-                exact_match_issnls = title2issnl.get(cited_journal_title_cleaned, '').split('#')
-                exact_match_issnls_std = [standardizer.journal_issn(i) for i in exact_match_issnls]
-                cit.setattr('issnls_size', len(exact_match_issnls))
-
-                # Correspondência exata com apenas um ISSN-L
-                if len(exact_match_issnls) == 1:
-                    standardized_issn = exact_match_issnls_std[0]
-                    cit.setattr('cited_issnl', standardized_issn)
-                    cit.setattr('result_code', SUCCESS_EXACT_MATCH)
-                    return cit
-
-                # Correspondência com mais de um ISSN-L
-                else:
-                    # Caso haja ano em formato de dígito
-                    if cited_year_cleaned.isdigit():
-
-                        # Caso haja volume
-                        if cited_volume_cleaned != '':
-
-                            # Usa chave titulo-ano-volume em busca na base real
-                            title_year_volume_key = '-'.join([cited_journal_title_cleaned, cited_year_cleaned, cited_volume_cleaned])
-
-                            if title_year_volume_key in title_year_volume2issn:
-                                yvk_issns = list(title_year_volume2issn[title_year_volume_key])
-
-                                if len(yvk_issns) == 1:
-                                    yvk_standardized_issn = standardizer.journal_issn(yvk_issns[0])
-                                    if yvk_standardized_issn in exact_match_issnls_std:
-                                        cit.setattr('cited_issnl', yvk_standardized_issn)
-                                        cit.setattr('result_code', SUCCESS_EXACT_MATCH_YEAR_VOL)
-                                        cit.setattr('title_year_volume_key', title_year_volume_key)
-                                        return cit
-
-                        # Usa chave titulo-ano com volume inferido em busca na base real
-                        result_issn_to_data = {'issns': set(), 'tyv_keys': {}}
-                        for i in exact_match_issnls:
-                            cit_volume_inferred = infer_volume(i, int(cited_year_cleaned), issn2equations)
-
-                            if cit_volume_inferred:
-                                for voli in [vi for vi in range(cit_volume_inferred - 1, cit_volume_inferred + 2) if vi > 0]:
-                                    tyv_key = '-'.join([
-                                        cited_journal_title_cleaned, 
-                                        cited_year_cleaned, 
-                                        str(voli)
-                                    ])
-                                    
-                                    possible_issnls = title_year_volume2issn.get(tyv_key, set())
-                                    if len(possible_issnls) > 0:
-                                        result_issn_to_data['issns'] = result_issn_to_data['issns'].union(possible_issnls)
-                                        
-                                        possible_issnls_sign = get_issns_list_sign(possible_issnls)
-                                        if possible_issnls_sign not in result_issn_to_data['tyv_keys']:
-                                            result_issn_to_data['tyv_keys'][possible_issnls_sign] = set()
-
-                                        result_issn_to_data['tyv_keys'][possible_issnls_sign].add(tyv_key)
-
-                                    if len(result_issn_to_data['issns']) > 1:
-                                        cit.setattr('result_code', ERROR_EXACT_MATCH_YEAR_VOL_INF)
-                                        return cit
-
-                        if len(result_issn_to_data['issns']) == 1:
-                            matched_issn = list(result_issn_to_data['issns'])[0]
-                            matched_issn_std = standardizer.journal_issn(matched_issn)
-                            matched_tyv_key = list(result_issn_to_data['tyv_keys'][matched_issn])[0]
-
-                            if matched_issn_std in exact_match_issnls_std:
-                                cit.setattr('cited_issnl', matched_issn_std)
-                                cit.setattr('result_code', SUCCESS_EXACT_MATCH_YEAR_VOL_INF)
-                                cit.setattr('title_year_volume_key', matched_tyv_key)
-                                return cit
-
-                        # Usa chave titulo-ano-volume em busca na base artificial
-                        if cited_volume_cleaned != '':
-                            key_title_year_volume = '-'.join([cited_journal_title_cleaned, cited_year_cleaned, cited_volume_cleaned])
-                            ktyv_values = artifitial_title_year_volume2issn.get(key_title_year_volume, set())
-                            ktyv_values = ktyv_values.union(title_year_volume2issn.get(key_title_year_volume, set()))
-                            
-                            if len(ktyv_values) == 1:
-                                ktyv_standardized_issn = standardizer.journal_issn(list(ktyv_values)[0])
-
-                                if ktyv_standardized_issn in exact_match_issnls_std:
-                                    cit.setattr('cited_issnl', ktyv_standardized_issn)
-                                    cit.setattr('result_code', SUCCESS_EXACT_MATCH_YEAR_VOL_ART)
-                                    cit.setattr('title_year_volume_key', key_title_year_volume)
-                                    return cit
-
-                        # Usa chave titulo-ano-volume inferido em busca na base artificial
-                        result_issn_to_data = {'issns': set(), 'tyv_keys': {}}
-                        for i in exact_match_issnls:
-                            cit_volume_inferred = infer_volume(i, int(cited_year_cleaned), issn2equations)
-
-                            if cit_volume_inferred:
-                                for voli in [vi for vi in range(cit_volume_inferred - 1, cit_volume_inferred + 2) if vi > 0]:
-                                    tyv_key = '-'.join([
-                                        cited_journal_title_cleaned, 
-                                        cited_year_cleaned, 
-                                        str(voli)
-                                    ])
-                                    
-                                    possible_issnls = artifitial_title_year_volume2issn.get(tyv_key, set())
-                                    if len(possible_issnls) > 0:
-                                        result_issn_to_data['issns'] = result_issn_to_data['issns'].union(possible_issnls)
-                                        
-                                        possible_issnls_sign = get_issns_list_sign(possible_issnls)
-                                        if possible_issnls_sign not in result_issn_to_data['tyv_keys']:
-                                            result_issn_to_data['tyv_keys'][possible_issnls_sign] = set()
-
-                                        result_issn_to_data['tyv_keys'][possible_issnls_sign].add(tyv_key)
-
-                                    if len(result_issn_to_data['issns']) > 1:
-                                        cit.setattr('result_code', ERROR_EXACT_MATCH_YEAR_VOL_INF_ART)
-                                        return cit
-
-                        if len(result_issn_to_data['issns']) == 1:
-                            matched_issn = list(result_issn_to_data['issns'])[0]
-                            matched_issn_std = standardizer.journal_issn(matched_issn)
-                            matched_tyv_key = list(result_issn_to_data['tyv_keys'][matched_issn])[0]
-
-                            if matched_issn_std in exact_match_issnls_std:
-                                cit.setattr('cited_issnl', matched_issn_std)
-                                cit.setattr('result_code', SUCCESS_EXACT_MATCH_YEAR_VOL_INF_ART)
-                                cit.setattr('title_year_volume_key', matched_tyv_key)
-                                return cit
-
-                        # Não foi possível decidir qual é o ISSN-L correto
-                        cit.setattr('result_code', ERROR_EXACT_MATCH_UNDECIDABLE)
-                        return cit
-
-                    # Não há dados de ano para fazer desambiguação
-                    else:
-                        cit.setattr('result_code', ERROR_EXACT_MATCH_INVALID_YEAR)
-                        return cit
-
-            # Correspondência inexata
-            else:
-                if use_fuzzy:
-                    # Não há dados suficientes para validar uma possível correspondência inexata
-                    if not cited_year_cleaned.isdigit():
-                        cit.setattr('result_code', ERROR_FUZZY_MATCH_INVALID_YEAR)
-                        return cit
-
-                    else:
-                        fuzzy_match_issnls = fuzzy_match(cited_journal_title_cleaned, title2issnl)
-
-                        # Há correspondência inexata com um ou mais códigos ISSN-L
-                        if len(fuzzy_match_issnls) > 0:
-                            cit.setattr('issnls_size', len(fuzzy_match_issnls))
-                            
-                            # Caso haja volume
-                            if cited_volume_cleaned != '':
-
-                                # Usa chave titulo-ano-volume com títulos possíveis em busca na base real
-                                fz_result_issn_to_data = {'issns': set(), 'tyv_keys': {}}
-                                for fz_title in get_titles(fuzzy_match_issnls, issn2titles):
-                                    fz_tyv_key = '-'.join([
-                                        fz_title, 
-                                        cited_year_cleaned, 
-                                        cited_volume_cleaned
-                                    ])
-
-                                    fz_possible_issnls = title_year_volume2issn.get(fz_tyv_key, set())
-                                    if len(fz_possible_issnls) > 0:
-                                        fz_result_issn_to_data['issns'] = fz_result_issn_to_data['issns'].union(fz_possible_issnls)
-
-                                        fz_possible_issnls_sign = get_issns_list_sign(fz_possible_issnls)
-                                        if fz_possible_issnls_sign not in fz_result_issn_to_data['tyv_keys']:
-                                            fz_result_issn_to_data['tyv_keys'][fz_possible_issnls_sign] = set()
-                                        fz_result_issn_to_data['tyv_keys'][fz_possible_issnls_sign].add(fz_tyv_key)
-
-                                        if len(fz_result_issn_to_data['issns']) > 1:
-                                            cit.setattr('result_code', ERROR_FUZZY_MATCH_YEAR_VOL)
-                                            return cit
-
-                                if len(fz_result_issn_to_data['issns']) == 1:
-                                    fz_matched_issn = list(fz_result_issn_to_data['issns'])[0]
-                                    fz_matched_issn_std = standardizer.journal_issn(fz_matched_issn)
-                                    fz_matched_tyv_key = list(fz_result_issn_to_data['tyv_keys'][fz_matched_issn])[0]
-
-                                    if fz_matched_issn in fuzzy_match_issnls:
-                                        cit.setattr('cited_issnl', fz_matched_issn_std)
-                                        cit.setattr('result_code', SUCCESS_FUZZY_MATCH_YEAR_VOL)
-                                        cit.setattr('title_year_volume_key', fz_matched_tyv_key)
-                                        return cit
-                            
-                            # Usa chave titulo-ano-volume com títulos possíveis e volumes inferidos em busca na base real
-                            fz_result_issn_to_data = {'issns': set(), 'tyv_keys': {}}
-                            for i in fuzzy_match_issnls:
-                                fz_cit_volume_inferred = infer_volume(i, int(cited_year_cleaned), issn2equations)
-
-                                if fz_cit_volume_inferred:
-                                    for voli in [vi for vi in range(fz_cit_volume_inferred - 1, fz_cit_volume_inferred + 2) if vi > 0]:
-                                        fz_tyv_key = '-'.join([
-                                            cited_journal_title_cleaned,
-                                            cited_year_cleaned,
-                                            str(voli),
-                                        ])
-                                        
-                                        fz_possible_issnls = title_year_volume2issn.get(fz_tyv_key, set())
-                                        if len(fz_possible_issnls) > 0:
-                                            fz_result_issn_to_data['issns'] = fz_result_issn_to_data['issns'].union(fz_possible_issnls)
-
-                                            fz_possible_issnls_sign = get_issns_list_sign(fz_possible_issnls)
-                                            if fz_possible_issnls_sign not in fz_result_issn_to_data['tyv_keys']:
-                                                fz_result_issn_to_data['tyv_keys'][fz_possible_issnls_sign] = set()
-
-                                            fz_result_issn_to_data['tyv_keys'][fz_possible_issnls_sign].add(fz_tyv_key)
-
-                                        if len(fz_result_issn_to_data['issns']) > 1:
-                                            cit.setattr('result_code', ERROR_FUZZY_MATCH_YEAR_VOL_INF)
-                                            return cit
-
-                            if len(fz_result_issn_to_data['issns']) == 1:
-                                fz_matched_issn = list(fz_result_issn_to_data['issns'])[0]
-                                fz_matched_issn_std = standardizer.journal_issn(fz_matched_issn)
-                                fz_matched_tyv_key = list(fz_result_issn_to_data['tyv_keys'][fz_matched_issn])[0]
-
-                                if fz_matched_issn in fuzzy_match_issnls:
-                                    cit.setattr('cited_issnl', fz_matched_issn_std)
-                                    cit.setattr('result_code', SUCCESS_FUZZY_MATCH_YEAR_VOL_INF)
-                                    cit.setattr('title_year_volume_key', fz_matched_tyv_key)
-                                    return cit
-
-                            # Usa chave titulo-ano-volume com títulos possíveis em busca na base artificial
-                            fz_result_issn_to_data = {'issns': set(), 'tyv_keys': {}}
-                            if cited_volume_cleaned != '':
-                                for fz_title in get_titles(fuzzy_match_issnls, issn2titles):
-                                    fz_tyv_key = '-'.join([
-                                        fz_title,
-                                        cited_year_cleaned,
-                                        cited_volume_cleaned,
-                                    ])
-
-                                    fz_possible_issnls = artifitial_title_year_volume2issn.get(fz_tyv_key, set())
-                                    if len(fz_possible_issnls) > 0:
-                                        fz_result_issn_to_data['issns'] = fz_result_issn_to_data['issns'].union(fz_possible_issnls)
-
-                                        fz_possible_issnls_sign = get_issns_list_sign(fz_possible_issnls)
-                                        if fz_possible_issnls_sign not in fz_result_issn_to_data['tyv_keys']:
-                                            fz_result_issn_to_data['tyv_keys'][fz_possible_issnls_sign] = set()
-                                        fz_result_issn_to_data['tyv_keys'][fz_possible_issnls_sign].add(fz_tyv_key)
-
-                                        if len(fz_result_issn_to_data['issns']) > 1:
-                                            cit.setattr('result_code', ERROR_FUZZY_MATCH_YEAR_VOL_ART)
-                                            return cit
-                                
-                                if len(fz_result_issn_to_data['issns']) == 1:
-                                    fz_matched_issn = list(fz_result_issn_to_data['issns'])[0]
-                                    fz_matched_issn_std = standardizer.journal_issn(fz_matched_issn)
-                                    fz_matched_tyv_key = list(fz_result_issn_to_data['tyv_keys'][fz_matched_issn])[0]
-
-                                    if fz_matched_issn in fuzzy_match_issnls:
-                                        cit.setattr('cited_issnl', fz_matched_issn_std)
-                                        cit.setattr('result_code', SUCCESS_FUZZY_MATCH_YEAR_VOL_ART)
-                                        cit.setattr('title_year_volume_key', fz_matched_tyv_key)
-                                        return cit
-                                            
-                            # Usa chave titulo-ano-volume com títulos possíveis e volumes inferidos em busca na base artificial                                            
-                            fz_result_issn_to_data = {'issns': set(), 'tyv_keys': {}}
-                            for i in fuzzy_match_issnls:
-                                fz_cit_volume_inferred = infer_volume(i, int(cited_year_cleaned), issn2equations)
-
-                                if fz_cit_volume_inferred:
-                                    for voli in [vi for vi in range(fz_cit_volume_inferred - 1, fz_cit_volume_inferred + 2) if vi > 0]:
-                                        for fz_title in get_titles([i], issn2titles):
-                                            fz_tyv_key = '-'.join([
-                                                fz_title,
-                                                cited_year_cleaned,
-                                                str(voli),
-                                            ])
-                                            
-                                            fz_possible_issnls = artifitial_title_year_volume2issn.get(fz_tyv_key, set())
-                                            if len(fz_possible_issnls) > 0:
-                                                fz_result_issn_to_data['issns'] = fz_result_issn_to_data['issns'].union(fz_possible_issnls)
-
-                                                fz_possible_issnls_sign = get_issns_list_sign(fz_possible_issnls)
-                                                if fz_possible_issnls_sign not in fz_result_issn_to_data['tyv_keys']:
-                                                    fz_result_issn_to_data['tyv_keys'][fz_possible_issnls_sign] = set()
-
-                                                fz_result_issn_to_data['tyv_keys'][fz_possible_issnls_sign].add(fz_tyv_key)
-
-                                            if len(fz_result_issn_to_data['issns']) > 1:
-                                                cit.setattr('result_code', ERROR_FUZZY_MATCH_YEAR_VOL_INF_ART)
-                                                return cit
-
-                            if len(fz_result_issn_to_data['issns']) == 1:
-                                fz_matched_issn = list(fz_result_issn_to_data['issns'])[0]
-                                fz_matched_issn_std = standardizer.journal_issn(fz_matched_issn)
-                                fz_matched_tyv_key = list(fz_result_issn_to_data['tyv_keys'][fz_matched_issn])[0]
-
-                                if fz_matched_issn in fuzzy_match_issnls:                                                    
-                                    cit.setattr('cited_issnl', fz_matched_issn_std)
-                                    cit.setattr('result_code', SUCCESS_FUZZY_MATCH_YEAR_VOL_INF_ART)
-                                    cit.setattr('title_year_volume_key', fz_matched_tyv_key)
-                                    return cit
-                                        
-
-                            # Não validou
-                            cit.setattr('result_code', ERROR_FUZZY_MATCH_UNDECIDABLE)
-                            return cit
-
-                        # Não houve correspondência inexata
-                        else:
-                            cit.setattr('result_code', ERROR_JOURNAL_TITLE_NOT_FOUND)
-                            return cit
-
-                # Não tentou fazer correspondência
-                else:
-                    cit.setattr('result_code', NOT_CONDUCTED_MATCH_FORCED_BY_USER)
-                    return cit
+            essential_data = (cited_journal_title_cleaned, cited_year_cleaned, cited_volume_cleaned)
+
+            result = cache.get(essential_data) if cache is not None else None
+            if result is None:
+                result = match_essential_data(
+                    cited_journal_title_cleaned,
+                    cited_year_cleaned,
+                    cited_volume_cleaned,
+                    title2issnl=title2issnl,
+                    issn2titles=issn2titles,
+                    title_year_volume2issn=title_year_volume2issn,
+                    artifitial_title_year_volume2issn=artifitial_title_year_volume2issn,
+                    issn2equations=issn2equations,
+                    use_fuzzy=use_fuzzy,
+                    title_index=title_index,
+                    homonym_table=homonym_table,
+                    match_manager=match_manager,
+                )
+
+                if cache is not None:
+                    cache.put(essential_data, result)
+
+            for k, v in result.items():
+                cit.setattr(k, v)
+
+            return cit
 
         # Caso não haja título de periódico
         else:
-            # Mas há DOI
-            if hasattr(cit, 'cited_doi') and cit.cited_doi:
-                cit.setattr('result_code', NOT_CONDUCTED_MATCH_DOI_EXISTS)
-                return cit
+            return enrich_without_title(cit)
 
-            # E não há DOI
+
+def enrich_without_title(cit):
+    # Mas há DOI
+    if hasattr(cit, 'cited_doi') and cit.cited_doi:
+        cit.setattr('result_code', NOT_CONDUCTED_MATCH_DOI_EXISTS)
+        return cit
+
+    # E não há DOI
+    else:
+        cit.setattr('result_code', ERROR_JOURNAL_TITLE_IS_EMPTY)
+        return cit
+
+
+class EnrichmentEngine:
+    """
+    Motor de enriquecimento que mantém as bases de correção carregadas e enriquece citações em lote.
+
+    enrich_many processa as citações em blocos: cada combinação distinta de título, ano e volume brutos do bloco é
+    normalizada uma única vez, cada trio título-ano-volume distinto é decidido uma única vez e os volumes inferidos
+    necessários para desambiguar títulos homônimos são calculados de uma só vez.
+    """
+
+    def __init__(self, bases: dict, use_fuzzy=False, format='json', ignore_previous_result=True, title_index=None, homonym_table=None, cache_size=RESULT_CACHE_SIZE, chunk_size=ENRICH_CHUNK_SIZE, stage_order=None):
+        self.title2issnl = bases['title2issnl']
+        self.issn2titles = bases['issn2titles']
+        self.title_year_volume2issn = bases['title_year_volume2issn']
+        self.artifitial_title_year_volume2issn = bases['artifitial_title_year_volume2issn']
+        self.issn2equations = bases['issn2equations']
+
+        self.use_fuzzy = use_fuzzy
+        self.format = format
+        self.ignore_previous_result = ignore_previous_result
+        self.chunk_size = chunk_size
+
+        if use_fuzzy and title_index is None:
+            title_index = TitleIndex(self.title2issnl)
+        self.title_index = title_index
+
+        self.homonym_table = homonym_table
+        self.cache = LRUCache(cache_size) if cache_size > 0 else None
+        self.metrics = EnrichmentMetrics()
+
+        self.match_manager = MatchManager(
+            self.title2issnl,
+            self.issn2titles,
+            self.title_year_volume2issn,
+            self.artifitial_title_year_volume2issn,
+            self.issn2equations,
+            use_fuzzy=use_fuzzy,
+            title_index=title_index,
+            homonym_table=homonym_table,
+            stage_order=stage_order,
+        )
+
+    @classmethod
+    def from_files(cls, title_to_issnl: str, issnl_to_all: str, title_year_volume_to_issn: str, artifitial_title_year_volume_to_issn: str, equations: str, compact=False, **kwargs):
+        """
+        Carrega as bases de correção a partir dos arquivos CSV e cria o motor de enriquecimento.
+        """
+        bases = file.load_correction_bases(
+            title_to_issnl,
+            issnl_to_all,
+            title_year_volume_to_issn,
+            artifitial_title_year_volume_to_issn,
+            equations,
+            compact=compact,
+        )
+
+        return cls(bases, **kwargs)
+
+    @property
+    def enrich_params(self):
+        return {
+            'format': self.format,
+            'ignore_previous_result': self.ignore_previous_result,
+            'title2issnl': self.title2issnl,
+            'issn2titles': self.issn2titles,
+            'title_year_volume2issn': self.title_year_volume2issn,
+            'artifitial_title_year_volume2issn': self.artifitial_title_year_volume2issn,
+            'issn2equations': self.issn2equations,
+            'use_fuzzy': self.use_fuzzy,
+            'title_index': self.title_index,
+            'cache': self.cache,
+            'homonym_table': self.homonym_table,
+            'match_manager': self.match_manager,
+        }
+
+    def enrich(self, data):
+        return enrich(data, **self.enrich_params)
+
+    def enrich_many(self, iterable):
+        """
+        Enriquece citações (linhas JSON ou CSV) de um iterável, em blocos de chunk_size, mantendo a ordem de entrada.
+        """
+        for chunk in read_chunks(iterable, self.chunk_size):
+            yield from self.enrich_chunk(chunk)
+
+    def enrich_chunk(self, lines):
+        return [cit for cit, result in self.enrich_results(lines)]
+
+    def previous_result_lines(self, lines):
+        """
+        Indica, para cada linha, se ela tem resultado prévio a ser mantido, sem ler a citação.
+        """
+        if self.ignore_previous_result or self.format != 'json':
+            return [False] * len(lines)
+
+        return [PREVIOUS_RESULT_PATTERN.search(line) is not None for line in lines]
+
+    def enrich_lines(self, lines):
+        """
+        Enriquece um bloco de linhas e devolve as linhas JSON de saída.
+        Linhas com resultado prévio mantido são copiadas como estão, sem construir a citação.
+        """
+        kept = self.previous_result_lines(lines)
+        if not any(kept):
+            citations = self.enrich_chunk(lines)
+
+            start = time.perf_counter()
+            output = [cit.to_json() + '\n' for cit in citations]
+            self.metrics.phases['serialize'] += time.perf_counter() - start
+
+            return output
+
+        self.count_kept(sum(kept))
+        enriched = iter(self.enrich_chunk([line for line, k in zip(lines, kept) if not k]))
+
+        start = time.perf_counter()
+        output = [(line if line.endswith('\n') else line + '\n') if k else next(enriched).to_json() + '\n' for line, k in zip(lines, kept)]
+        self.metrics.phases['serialize'] += time.perf_counter() - start
+
+        return output
+
+    def enrich_line_results(self, lines):
+        """
+        Enriquece um bloco de linhas e devolve apenas os campos de resultado de cada uma (None se o resultado prévio foi mantido).
+        """
+        kept = self.previous_result_lines(lines)
+        if not any(kept):
+            return [result for cit, result in self.enrich_results(lines)]
+
+        self.count_kept(sum(kept))
+        results = iter(self.enrich_results([line for line, k in zip(lines, kept) if not k]))
+
+        return [None if k else next(results)[1] for k in kept]
+
+    def group_citations(self, lines):
+        """
+        Pré-passagem do bloco: lê cada citação e a agrupa pelos campos brutos de título, ano e volume; cada combinação
+        distinta do bloco é normalizada uma única vez no trio título-ano-volume.
+
+        Devolve a lista de pares (citação, trio ou resultado já definido), na ordem de entrada, e o dicionário
+        trio -> resultado, com o resultado em cache (ou None, se o trio ainda precisa de correspondência).
+        """
+        citations = []
+        raw_groups = {}
+        groups = {}
+
+        for line in lines:
+            cit = Citation(line, format=self.format)
+
+            # Caso citação já tenha sido tratada e ISSN-L é válido
+            if not self.ignore_previous_result and 'cited_issnl' in cit.__dict__:
+                self.metrics.kept += 1
+                citations.append((cit, None))
+                continue
+
+            clean_previous_results(cit)
+            raw_data = extract_raw_data(cit)
+
+            try:
+                essential_data = raw_groups.get(raw_data)
+            except TypeError:
+                # Campos não hasheáveis (por exemplo, listas vindas do JSON) são normalizados por citação
+                essential_data = standardize_essential_data(*raw_data)
             else:
-                cit.setattr('result_code', ERROR_JOURNAL_TITLE_IS_EMPTY)
-                return cit
+                if essential_data is None:
+                    essential_data = raw_groups[raw_data] = standardize_essential_data(*raw_data)
 
+            # Citações sem título de periódico são resolvidas por enrich
+            if not essential_data[0]:
+                enrich_without_title(cit)
+                citations.append((cit, {'result_code': cit.result_code}))
+                continue
 
-def main():
-    parser = argparse.ArgumentParser()
+            if essential_data not in groups:
+                groups[essential_data] = self.cache.get(essential_data) if self.cache is not None else None
+
+            citations.append((cit, essential_data))
+
+        return citations, groups
+
+    def enrich_results(self, lines):
+        """
+        Enriquece um bloco de citações e devolve pares (citação, campos de resultado atribuídos), na ordem de entrada.
+        Cada trio título-ano-volume distinto do bloco passa pela correspondência uma única vez (e nenhuma, se estiver
+        em cache); seu resultado é atribuído a todas as citações do grupo.
+        Citações cujo resultado prévio foi mantido têm None no lugar dos campos.
+        """
+        start = time.perf_counter()
+        self.metrics.lines += len(lines)
+
+        citations, groups = self.group_citations(lines)
+
+        undecided = [k for k, v in groups.items() if v is None]
+        self.metrics.groups += len(groups)
+        self.metrics.matched += len(undecided)
+        self.metrics.phases['parse'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.prefetch_inferred_volumes(undecided)
+        self.metrics.phases['prefetch'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        for essential_data in undecided:
+            result = self.match_manager.match(*essential_data)
+            groups[essential_data] = result
+
+            if self.cache is not None:
+                self.cache.put(essential_data, result)
+
+        enriched = []
+        for cit, essential_data in citations:
+            if isinstance(essential_data, tuple):
+                result = groups[essential_data]
+
+                for k, v in result.items():
+                    cit.setattr(k, v)
+
+            # Resultado já definido (citação sem título) ou mantido (None)
+            else:
+                result = essential_data
+
+            if result is not None:
+                self.metrics.result_codes[result['result_code']] += 1
+
+            enriched.append((cit, result))
+
+        self.metrics.phases['match'] += time.perf_counter() - start
+
+        return enriched
+
+    def count_kept(self, kept_lines):
+        self.metrics.lines += kept_lines
+        self.metrics.kept += kept_lines
+
+    def collect_metrics(self):
+        """
+        Devolve os contadores acumulados desde a última coleta, incluindo os das etapas de correspondência, e os zera.
+        """
+        self.metrics.add_stages(self.match_manager.stats())
+        self.match_manager.reset_stats()
+
+        collected = self.metrics.to_dict()
+        self.metrics = EnrichmentMetrics()
+
+        return collected
+
+    def prefetch_inferred_volumes(self, essential_data_list):
+        """
+        Infere de uma só vez, com a tabela vetorizada, os volumes usados na desambiguação de títulos homônimos do bloco.
+        """
+        if not hasattr(self.issn2equations, 'infer_many'):
+            return
+
+        issn_year_pairs = []
+        for title, year, volume in essential_data_list:
+            issnls = self.title2issnl.get(title, '')
+
+            if '#' in issnls and year.isdigit() and (self.homonym_table is None or title not in self.homonym_table):
+                issn_year_pairs.extend((i, int(year)) for i in issnls.split('#'))
+
+        if issn_year_pairs:
+            self.issn2equations.infer_many(issn_year_pairs)
+
+
+def enrich_chunk(lines):
+    engine = _shared['engine']
+    return engine.enrich_lines(lines), engine.collect_metrics()
+
+
+def enrich_chunk_results(lines):
+    engine = _shared['engine']
+    return engine.enrich_line_results(lines), engine.collect_metrics()
+
+
+def merge_chunk_metrics(chunks_output, engine):
+    """
+    Soma aos contadores do motor os enviados pelos processos filhos junto de cada bloco.
+    """
+    for output, chunk_metrics in chunks_output:
+        engine.metrics.merge(chunk_metrics)
+        yield output
+
+
+def sidecar_records(results, first_line, metrics):
+    start = time.perf_counter()
+    records = [sidecar.record(n, r) for n, r in enumerate(results, start=first_line) if r is not None]
+    metrics.phases['serialize'] += time.perf_counter() - start
+
+    return records
+
+
+def enrich_file(in_file, out_file, engine, pool=None, chunk_size=ENRICH_CHUNK_SIZE, max_pending=2, output_mode='full', checkpoint_interval=0, resume=False, encoding=None, max_lines=None):
+    if (checkpoint_interval > 0 or resume) and not (stream.is_seekable(in_file) and stream.is_seekable(out_file)):
+        raise ValueError(f'Checkpoints exigem arquivos de entrada e saída comuns, sem compressão (entrada {in_file}, saída {out_file})')
+
+    if encoding:
+        file_encoding = encoding
+    else:
+        file_encoding = detect_file_encoding(in_file)
+        logging.debug(f'Charset detectado de {in_file} é {file_encoding}')
+
+    state = {'input_offset': 0, 'output_offset': 0, 'lines': 0, 'output_mode': output_mode, 'complete': False}
+
+    if resume:
+        previous_state = checkpoint.load_checkpoint(out_file, in_file, output_mode)
+
+        if previous_state is not None and previous_state['complete']:
+            logging.info(f'{in_file} já foi enriquecido em {out_file}')
+            return previous_state['lines']
+
+        if previous_state is not None:
+            logging.info(f'Retomando {in_file} a partir da linha {previous_state["lines"] + 1} (byte {previous_state["input_offset"]})')
+            state.update({k: previous_state[k] for k in ['input_offset', 'output_offset', 'lines']})
+
+            # Descarta a saída gravada após o último checkpoint
+            os.truncate(out_file, state['output_offset'])
+
+    # Posições em bytes da entrada exigem leitura binária, decodificada linha a linha
+    if checkpoint_interval > 0 or resume:
+        if '\n'.encode(file_encoding) != b'\n':
+            raise ValueError(f'Checkpoints exigem arquivo de entrada com codificação compatível com ASCII ({in_file} está em {file_encoding})')
+
+        fin = stream.open_input_binary(in_file)
+        fin.seek(state['input_offset'])
+        chunk_offsets = collections.deque()
+        chunks = read_chunks_with_offsets(itertools.islice(fin, max_lines), file_encoding, chunk_size, state['input_offset'], chunk_offsets)
+    else:
+        fin = stream.open_input(in_file, encoding=file_encoding)
+        chunk_offsets = None
+        chunks = read_chunks(itertools.islice(fin, max_lines), chunk_size)
+
+    with fin, stream.open_output(out_file, 'a' if state['output_offset'] > 0 else 'w') as fout:
+        # Apenas número da linha e campos de resultado, a serem unidos à entrada por join-sidecar
+        if output_mode == 'sidecar':
+            if state['lines'] == 0:
+                fout.write(sidecar.header(in_file, engine.format))
+
+            if pool is not None:
+                chunks_results = merge_chunk_metrics(imap_ordered(pool, enrich_chunk_results, chunks, max_pending), engine)
+            else:
+                chunks_results = (engine.enrich_line_results(chunk) for chunk in chunks)
+
+            chunks_output = ((sidecar_records(results, state['lines'] + 1, engine.metrics), len(results)) for results in chunks_results)
+
+        else:
+            if pool is not None:
+                chunks_lines = merge_chunk_metrics(imap_ordered(pool, enrich_chunk, chunks, max_pending), engine)
+            else:
+                chunks_lines = (engine.enrich_lines(chunk) for chunk in chunks)
+
+            chunks_output = ((enriched_lines, len(enriched_lines)) for enriched_lines in chunks_lines)
+
+        lines_since_checkpoint = 0
+        resumed_lines = state['lines']
+        start_time = time.time()
+
+        for output_lines, chunk_lines in chunks_output:
+            start = time.perf_counter()
+            fout.writelines(output_lines)
+            engine.metrics.phases['write'] += time.perf_counter() - start
+
+            state['lines'] += chunk_lines
+            logging.debug(f'{state["lines"]} linhas ({(state["lines"] - resumed_lines) / max(time.time() - start_time, 1e-9):.0f} linhas/s)')
+
+            if chunk_offsets is not None:
+                state['input_offset'] = chunk_offsets.popleft()
+                lines_since_checkpoint += chunk_lines
+
+                if lines_since_checkpoint >= checkpoint_interval:
+                    fout.flush()
+                    state['output_offset'] = fout.tell()
+                    checkpoint.save_checkpoint(out_file, in_file, state)
+                    lines_since_checkpoint = 0
+
+        if chunk_offsets is not None:
+            fout.flush()
+            state['output_offset'] = fout.tell()
+            state['complete'] = True
+            checkpoint.save_checkpoint(out_file, in_file, state)
+
+    return state['lines']
+
+
+def enrich_file_task(paths, **enrich_file_params):
+    in_file, out_file = paths
+    start_time = time.time()
+
+    engine = _shared['engine']
+    line_counter = enrich_file(in_file, out_file, engine, chunk_size=engine.chunk_size, **enrich_file_params)
+
+    return in_file, out_file, line_counter, time.time() - start_time, engine.collect_metrics()
+
+
+def enrich_files_in_parallel(pool, in_out_files, metrics=None, **enrich_file_params):
+    """
+    Enriquece vários arquivos simultaneamente, um por processo, começando pelos maiores
+    para que arquivos pequenos ocupem os processos que ficarem livres no fim.
+    Os contadores de cada arquivo, coletados no processo que o enriqueceu, são somados a metrics.
+    """
+    in_file_to_size = {in_file: os.path.getsize(in_file) for in_file, out_file in in_out_files}
+    total_size = sum(in_file_to_size.values())
+    total_files = len(in_out_files)
+
+    scheduled = sorted(in_out_files, key=lambda x: in_file_to_size[x[0]], reverse=True)
+
+    done_files = 0
+    done_size = 0
+    done_lines = 0
+    start_time = time.time()
+
+    for in_file, out_file, line_counter, elapsed, file_metrics in pool.imap_unordered(functools.partial(enrich_file_task, **enrich_file_params), scheduled, chunksize=1):
+        done_files += 1
+        done_size += in_file_to_size[in_file]
+        done_lines += line_counter
+
+        if metrics is not None:
+            metrics.merge(file_metrics)
+
+        logging.info(f'[{done_files}/{total_files}] {in_file} enriquecido em {out_file} ({line_counter} linhas em {elapsed:.1f}s, {line_counter / elapsed if elapsed > 0 else 0:.0f} linhas/s)')
+        logging.info(f'Progresso: {done_size / total_size if total_size else 1:.1%} dos dados, {done_lines} linhas em {time.time() - start_time:.1f}s')
+
+    return done_lines
+
+
+def read_chunks(fin, chunk_size):
+    chunk = []
+
+    for line in fin:
+        chunk.append(line)
+
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+def read_chunks_with_offsets(fin, encoding, chunk_size, offset, chunk_offsets):
+    """
+    Equivalente a read_chunks para um arquivo aberto em modo binário: decodifica cada linha e registra em chunk_offsets
+    a posição (em bytes) do fim de cada bloco, na ordem em que os blocos são lidos.
+    """
+    chunk = []
+
+    for raw_line in fin:
+        offset += len(raw_line)
+
+        line = raw_line.decode(encoding)
+        if line.endswith('\r\n'):
+            line = line[:-2] + '\n'
+
+        chunk.append(line)
+
+        if len(chunk) == chunk_size:
+            chunk_offsets.append(offset)
+            yield chunk
+            chunk = []
 
+    if chunk:
+        chunk_offsets.append(offset)
+        yield chunk
+
+
+def imap_ordered(pool, func, iterable, max_pending):
+    """
+    Equivalente a pool.imap que mantém no máximo max_pending tarefas em andamento,
+    evitando ler todo o arquivo de entrada para a memória enquanto os processos trabalham.
+    """
+    pending = collections.deque()
+
+    for item in iterable:
+        pending.append(pool.apply_async(func, (item,)))
+
+        if len(pending) >= max_pending:
+            yield pending.popleft().get()
+
+    while pending:
+        yield pending.popleft().get()
+
+
+def add_engine_arguments(parser):
+    """
+    Adiciona ao parser os parâmetros das bases de correção e do motor de enriquecimento.
+    """
     parser.add_argument(
         '--title_to_issnl',
         required=True,
@@ -490,14 +842,12 @@ def main():
 
     parser.add_argument(
         '--title_year_volume_to_issn',
-        required=True,
-        help='Base de correção Título de periódico, Ano, Volume -> ISSN',
+        help='Base de correção Título de periódico, Ano, Volume -> ISSN; dispensável com --title_year_volume_index',
     )
 
     parser.add_argument(
         '--artifitial_title_year_volume_to_issn',
-        required=True,
-        help='Base de correção artificial Título de periódico, Ano, Volume -> ISSN'
+        help='Base de correção artificial Título de periódico, Ano, Volume -> ISSN; dispensável com --artifitial_title_year_volume_index'
     )
 
     parser.add_argument(
@@ -506,25 +856,42 @@ def main():
     )
 
     parser.add_argument(
-        '--use_fuzzy',
+        '--title_year_volume_index',
+        help='Índice mapeado em memória (gerado por compile-year-volume-index) usado no lugar da base Título de periódico, Ano, Volume -> ISSN'
+    )
+
+    parser.add_argument(
+        '--artifitial_title_year_volume_index',
+        help='Índice mapeado em memória usado no lugar da base artificial Título de periódico, Ano, Volume -> ISSN'
+    )
+
+    parser.add_argument(
+        '--inference_table',
         action='store_true',
-        help='Usar deduplicação aproximada de Título de periódico',
+        help='Infere volumes com uma tabela vetorizada (NumPy) das regressões lineares; requer o extra inference (pip install cited-references[inference])'
     )
 
     parser.add_argument(
-        '--output',
-        default='results.jsonl',
-        help='Arquivo de resultados, isto é, com referências citadas enriquecidas'
+        '--homonym_table',
+        action='store_true',
+        help='Pré-calcula as decisões de desambiguação de títulos homônimos (ano, volume -> ISSN-L) ao carregar as bases, com as etapas de --match_stages'
     )
 
     parser.add_argument(
-        '--input',
-        help='Arquivo de entrada, isto é, com referências citadas a serem enriquecidas'
+        '--compact_bases',
+        action='store_true',
+        help='Carrega as bases com ISSNs codificados como inteiros, conjuntos de ISSNs compartilhados e títulos internados'
     )
 
     parser.add_argument(
-        '--input_dir',
-        help='Diretório de entrada, isto é, com arquivos contendo referências citadas a serem enriquecidas'
+        '--snapshot',
+        help='Snapshot binário das bases de correção (gerado por compile-bases); se desatualizado ou gerado com --compact diferente de --compact_bases, as bases em CSV são usadas'
+    )
+
+    parser.add_argument(
+        '--use_fuzzy',
+        action='store_true',
+        help='Usar deduplicação aproximada de Título de periódico',
     )
 
     parser.add_argument(
@@ -541,6 +908,238 @@ def main():
         help='Indica para ignorar cited_issnl pré-existente'
     )
 
+    parser.add_argument(
+        '--keep_previous_result',
+        dest='ignore_previous_result',
+        action='store_false',
+        help='Mantém citações com cited_issnl pré-existente; em JSON, essas linhas são copiadas sem ser lidas'
+    )
+
+    parser.add_argument(
+        '--json_backend',
+        default=json_backend.JSON_BACKEND,
+        choices=json_backend.BACKENDS,
+        help='Biblioteca usada para ler e gravar citações em JSON; apenas json preserva byte a byte a saída padrão'
+    )
+
+    parser.add_argument(
+        '--standardizer_cache_size',
+        type=int,
+        default=standardizer.STANDARDIZER_CACHE_SIZE,
+        help='Número máximo de valores normalizados mantidos em cache por função de padronização'
+    )
+
+    parser.add_argument(
+        '--title_cache',
+        help='Arquivo JSON para persistir, entre execuções, o cache de normalização de títulos de periódicos'
+    )
+
+    parser.add_argument(
+        '--cache_size',
+        type=int,
+        default=RESULT_CACHE_SIZE,
+        help='Número máximo de resultados (título, ano, volume) mantidos em cache; 0 desativa o cache'
+    )
+
+    parser.add_argument(
+        '--chunk_size',
+        type=int,
+        default=ENRICH_CHUNK_SIZE,
+        help='Número de linhas enriquecidas por bloco; com --workers, enviadas a cada processo por vez'
+    )
+
+    parser.add_argument(
+        '--match_stages',
+        default=','.join(DEFAULT_STAGE_ORDER),
+        help='Ordem das etapas de correspondência, separadas por vírgula (etapas omitidas não são executadas); exact ou fuzzy deve preceder as etapas de desambiguação'
+    )
+
+
+def build_engine(params):
+    """
+    Carrega as bases de correção conforme os parâmetros de add_engine_arguments e cria o motor de enriquecimento.
+    """
+    if not params.title_year_volume_to_issn and not params.title_year_volume_index:
+        raise ValueError('Informe --title_year_volume_to_issn ou --title_year_volume_index')
+
+    if not params.artifitial_title_year_volume_to_issn and not params.artifitial_title_year_volume_index:
+        raise ValueError('Informe --artifitial_title_year_volume_to_issn ou --artifitial_title_year_volume_index')
+
+    standardizer.set_cache_size(params.standardizer_cache_size)
+
+    backend = json_backend.set_backend(params.json_backend)
+    logging.info(f'Usando biblioteca {backend} para ler e gravar citações')
+
+    if params.title_cache:
+        logging.info(f'Carregando cache de normalização de títulos de {params.title_cache}...')
+        loaded_titles = standardizer.load_title_cache(params.title_cache)
+        logging.info(f'Há {loaded_titles} título(s) normalizado(s) em cache')
+
+    sources = {
+        'title_to_issnl': params.title_to_issnl,
+        'issnl_to_all': params.issnl_to_all,
+        'title_year_volume_to_issn': params.title_year_volume_to_issn,
+        'artifitial_title_year_volume_to_issn': params.artifitial_title_year_volume_to_issn,
+        'equations': params.equations,
+    }
+
+    # Bases título-ano-volume consultadas em disco não são carregadas em memória
+    if params.title_year_volume_index:
+        sources['title_year_volume_to_issn'] = None
+
+    if params.artifitial_title_year_volume_index:
+        sources['artifitial_title_year_volume_to_issn'] = None
+
+    bases = None
+    if params.snapshot:
+        logging.info(f'Carregando bases de correção do snapshot {params.snapshot}...')
+        bases = snapshot.load_snapshot(params.snapshot, sources, compact=params.compact_bases)
+
+        if bases is None:
+            logging.warning('Carregando bases de correção a partir dos arquivos CSV')
+
+    if bases is None:
+        bases = file.load_correction_bases(**sources, compact=params.compact_bases)
+
+    if params.title_year_volume_index:
+        logging.info(f'Abrindo índice Title Year Volume to ISSN {params.title_year_volume_index}...')
+        bases['title_year_volume2issn'] = YearVolumeIndex(params.title_year_volume_index)
+
+    if params.artifitial_title_year_volume_index:
+        logging.info(f'Abrindo índice artificial Title Year Volume to ISSN {params.artifitial_title_year_volume_index}...')
+        bases['artifitial_title_year_volume2issn'] = YearVolumeIndex(params.artifitial_title_year_volume_index)
+
+    title2issnl = bases['title2issnl']
+    title_year_volume2issn = bases['title_year_volume2issn']
+    artifitial_title_year_volume2issn = bases['artifitial_title_year_volume2issn']
+    issn2equations = bases['issn2equations']
+
+    if params.inference_table:
+        try:
+            from core.model.volume_inference import VolumeInferenceTable
+        except ImportError:
+            raise ValueError('--inference_table exige o pacote numpy (pip install cited-references[inference])')
+
+        logging.info('Construindo tabela vetorizada de regressões lineares...')
+        issn2equations = VolumeInferenceTable(issn2equations)
+
+    title_index = None
+    if params.use_fuzzy:
+        logging.info('Construindo índice de palavras da base Title to ISSN-L...')
+        title_index = TitleIndex(title2issnl)
+
+    stage_order = [st.strip() for st in params.match_stages.split(',') if st.strip()]
+
+    homonym_table = None
+    if params.homonym_table:
+        logging.info('Pré-calculando tabela de desambiguação de títulos homônimos...')
+        homonym_table = build_homonym_table(title2issnl, title_year_volume2issn, artifitial_title_year_volume2issn, issn2equations, stage_order)
+        logging.info(f'Há {len(homonym_table)} título(s) homônimo(s) na tabela de desambiguação')
+
+    return EnrichmentEngine(
+        bases={**bases, 'issn2equations': issn2equations},
+        use_fuzzy=params.use_fuzzy,
+        format=params.input_format,
+        ignore_previous_result=params.ignore_previous_result,
+        title_index=title_index,
+        homonym_table=homonym_table,
+        cache_size=params.cache_size,
+        chunk_size=params.chunk_size,
+        stage_order=stage_order,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+
+    add_engine_arguments(parser)
+
+    parser.add_argument(
+        '--output',
+        default='results.jsonl',
+        help='Arquivo de resultados, isto é, com referências citadas enriquecidas; - grava na saída padrão; extensões .gz, .bz2, .xz e .zst comprimem a saída'
+    )
+
+    parser.add_argument(
+        '--input',
+        help='Arquivo de entrada, isto é, com referências citadas a serem enriquecidas; - lê da entrada padrão; arquivos .gz, .bz2, .xz e .zst são descomprimidos durante a leitura'
+    )
+
+    parser.add_argument(
+        '--input_dir',
+        help='Diretório de entrada, isto é, com arquivos contendo referências citadas a serem enriquecidas'
+    )
+
+    parser.add_argument(
+        '--encoding',
+        help='Codificação dos arquivos de entrada; por padrão, detectada a partir de amostras do início, do meio e do fim de cada arquivo'
+    )
+
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Número de processos de enriquecimento; as bases de correção são carregadas uma vez e compartilhadas'
+    )
+
+    parser.add_argument(
+        '--parallel_files',
+        action='store_true',
+        help='Com --input_dir e --workers, enriquece vários arquivos simultaneamente (maiores primeiro) em vez de dividir cada arquivo em blocos'
+    )
+
+    parser.add_argument(
+        '--checkpoint_interval',
+        type=int,
+        default=0,
+        help=f'Número de linhas entre checkpoints (posições da entrada e da saída gravadas em <saída>.checkpoint); 0 desativa, exceto com --resume ({CHECKPOINT_INTERVAL})'
+    )
+
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Retoma cada arquivo a partir do último checkpoint, descartando a saída gravada depois dele; arquivos concluídos não são enriquecidos novamente'
+    )
+
+    parser.add_argument(
+        '--output_mode',
+        default='full',
+        choices=['full', 'sidecar'],
+        help='full grava as citações enriquecidas; sidecar grava apenas número da linha e campos de resultado (ver join-sidecar)'
+    )
+
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Enriquece apenas as primeiras --profile_lines linhas de cada arquivo, sob cProfile, em um único processo; grava <saída>.prof (pstats) e <saída>.prof.txt (funções mais custosas); as saídas são gravadas como <saída>.profile.<ext> ou, com --input_dir, <arquivo>.N.profile.enriched.<ext>'
+    )
+
+    parser.add_argument(
+        '--profile_lines',
+        type=int,
+        default=profiling.PROFILE_LINES,
+        help='Número de linhas de cada arquivo enriquecidas com --profile; 0 enriquece o arquivo inteiro'
+    )
+
+    parser.add_argument(
+        '--profile_top',
+        type=int,
+        default=profiling.PROFILE_TOP,
+        help='Número de funções listadas no resumo do perfil'
+    )
+
+    parser.add_argument(
+        '--profile_sort',
+        default='cumulative',
+        choices=profiling.SORT_KEYS,
+        help='Ordenação das funções no resumo do perfil'
+    )
+
+    parser.add_argument(
+        '--metrics',
+        help='Arquivo JSON em que são gravadas as métricas da execução (vazão, tempo por fase e por etapa de correspondência, contagem por código de resultado)'
+    )
+
     params = parser.parse_args()
 
     logging.basicConfig(
@@ -558,58 +1157,110 @@ def main():
     else:
         input_pathfiles = [params.input,]
 
+    # Checkpoints registram posições em bytes, indisponíveis em stdin/stdout e em arquivos comprimidos
+    if params.checkpoint_interval or params.resume:
+        checkpointed_files = input_pathfiles if params.input_dir else input_pathfiles + [params.output]
+        not_seekable = [f for f in checkpointed_files if not stream.is_seekable(f)]
+
+        if not_seekable:
+            logging.error(f'--checkpoint_interval e --resume não podem ser usados com stdin/stdout ou arquivos comprimidos: {", ".join(not_seekable)}')
+            exit(1)
+
+    if params.profile and (params.checkpoint_interval or params.resume):
+        logging.error('--profile não pode ser usado com --checkpoint_interval e --resume')
+        exit(1)
+
     total_files = len(input_pathfiles)
     logging.info(f'Há {total_files} arquivo(s) a ser(em) enriquecido(s)')
 
-    logging.info('Carregando base Title to ISSN-L...')
-    title2issnl = file.load_title_to_issnl(params.title_to_issnl)
+    load_start_time = time.time()
+    engine = build_engine(params)
+    load_elapsed = time.time() - load_start_time
+
+    start_time = time.time()
 
-    logging.info('Carregando base ISSN-L to All...')
-    issn2issnl, issn2titles = file.load_issnl_to_all(params.issnl_to_all)
+    # cProfile observa apenas o processo atual
+    if params.profile and params.workers > 1:
+        logging.warning('Com --profile, o enriquecimento ocorre em um único processo; --workers foi ignorado')
 
-    logging.info('Carregando base Title Year Volume to ISSN...')
-    title_year_volume2issn = file.load_year_volume(params.title_year_volume_to_issn, issn2issnl)
+    pool = None
+    if params.workers > 1 and not params.profile:
+        # Bases já carregadas são herdadas pelos processos filhos (copy-on-write)
+        _shared['engine'] = engine
+        pool = mp.get_context('fork').Pool(params.workers)
+        logging.info(f'Usando {params.workers} processos de enriquecimento')
 
-    logging.info('Carregando base artificial Title Year Volume to ISSN...')
-    artifitial_title_year_volume2issn = file.load_year_volume(params.artifitial_title_year_volume_to_issn, issn2issnl)
+    enrich_file_params = {
+        'output_mode': params.output_mode,
+        'checkpoint_interval': params.checkpoint_interval or (CHECKPOINT_INTERVAL if params.resume else 0),
+        'resume': params.resume,
+        'encoding': params.encoding,
+    }
 
-    logging.info('Carregando regressões lineares')
-    issn2equations = file.load_equations(params.equations)
+    if pool is not None and params.input_dir and params.parallel_files:
+        in_out_files = [(in_file, gen_output_path(params.input_dir, in_file, params.output, params.output_mode, params.resume)) for in_file in input_pathfiles]
+        enrich_files_in_parallel(pool, in_out_files, metrics=engine.metrics, **enrich_file_params)
 
-    for in_file in input_pathfiles:
-        out_file = gen_output_path(params.input_dir, in_file, params.output)
+    else:
+        for in_file in input_pathfiles:
+            out_file = gen_output_path(params.input_dir, in_file, params.output, params.output_mode, params.resume, params.profile)
 
-        with open(out_file, 'w') as fout:
             logging.info(f'Enriquecendo {in_file} em {out_file}...')
-            line_counter = 0
-
-            file_encoding = detect_file_encoding(in_file)
-            logging.debug(f'Charset detectado de {in_file} é {file_encoding}')
-
-            with open(in_file, encoding=file_encoding) as fin:
-                line = fin.readline()
-
-                while line:
-                    line_counter += 1
-                    if line_counter % 100 == 0:
-                        logging.debug(f'{line_counter}')
-                        fout.flush()
-
-                    citation_enriched = enrich(
-                        line, 
-                        format=params.input_format, 
-                        ignore_previous_result=params.ignore_previous_result,
-                        title2issnl=title2issnl,
-                        issn2titles=issn2titles,
-                        title_year_volume2issn=title_year_volume2issn,
-                        artifitial_title_year_volume2issn=artifitial_title_year_volume2issn,
-                        issn2equations=issn2equations,
-                        use_fuzzy=params.use_fuzzy,
-                    )
-
-                    fout.write(citation_enriched.to_json() + '\n')
-
-                    line = fin.readline()
+
+            if params.profile:
+                stats_path, summary_path = profiling.profile_paths(out_file)
+                profiling.profile_call(
+                    functools.partial(enrich_file, in_file, out_file, engine, chunk_size=params.chunk_size, max_lines=params.profile_lines or None, **enrich_file_params),
+                    stats_path,
+                    summary_path,
+                    top=params.profile_top,
+                    sort=params.profile_sort,
+                )
+                logging.info(f'Perfil de {in_file} gravado em {stats_path} e {summary_path}')
+
+            else:
+                enrich_file(in_file, out_file, engine, pool=pool, chunk_size=params.chunk_size, max_pending=params.workers * 2, **enrich_file_params)
+
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    elapsed = time.time() - start_time
+
+    # Com --workers, os contadores dos processos filhos já foram somados aos do motor
+    run_metrics = EnrichmentMetrics()
+    run_metrics.merge(engine.collect_metrics())
+
+    for summary_line in run_metrics.summary_lines(elapsed):
+        logging.info(summary_line)
+
+    caches = {}
+
+    # Com --workers, cada processo filho mantém seus próprios caches
+    if pool is None:
+        if engine.cache is not None:
+            cache_stats = engine.cache.stats()
+            caches['results'] = cache_stats
+            logging.info(f'Cache de resultados: {cache_stats["hits"]} acertos, {cache_stats["misses"]} falhas ({cache_stats["hit_ratio"]:.2%}), {cache_stats["size"]}/{cache_stats["maxsize"]} entradas')
+
+        for func_name, func_stats in standardizer.stats().items():
+            caches[func_name] = func_stats
+            logging.info(f'Cache de {func_name}: {func_stats["hits"]} acertos, {func_stats["misses"]} falhas ({func_stats["hit_ratio"]:.2%}), {func_stats["size"]}/{func_stats["maxsize"]} entradas')
+
+    if params.metrics:
+        save_metrics(params.metrics, run_metrics.report(
+            elapsed,
+            files=input_pathfiles,
+            workers=params.workers,
+            use_fuzzy=params.use_fuzzy,
+            load_elapsed=load_elapsed,
+            caches=caches,
+        ))
+        logging.info(f'Métricas da execução gravadas em {params.metrics}')
+
+    if params.title_cache:
+        saved_titles = standardizer.save_title_cache(params.title_cache)
+        logging.info(f'Cache de normalização de títulos ({saved_titles} título(s)) salvo em {params.title_cache}')
 
 
 if __name__ == '__main__':
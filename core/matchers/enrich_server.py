@@ -0,0 +1,368 @@
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import logging
+import multiprocessing as mp
+import os
+import signal
+import time
+
+from aiohttp import web
+
+from core.matchers import enrich_references
+from core.util import cached_standardizer as standardizer
+from core.util import snapshot
+
+
+LOGGING_LEVEL = os.environ.get('LOGGING_LEVEL', logging.INFO)
+SERVER_HOST = os.environ.get('SERVER_HOST', '127.0.0.1')
+SERVER_PORT = int(os.environ.get('SERVER_PORT', '8080'))
+
+# Motor de enriquecimento da geração atendida por cada processo do pool, definido ao iniciá-lo
+_shared = {'engine': None}
+
+
+def init_worker(engine):
+    _shared['engine'] = engine
+
+    # Interrupção (Ctrl+C) é tratada apenas pelo servidor, que encerra o pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def enrich_lines(lines, engine=None):
+    engine = engine or _shared['engine']
+    return ''.join(engine.enrich_lines(lines))
+
+
+class EngineGeneration:
+    """
+    Geração das bases de correção: motor de enriquecimento e executor (processos ou thread) que o utiliza.
+
+    Cada lote mantém a geração em que começou (acquire/release); uma geração substituída (retire) só encerra
+    seu executor quando o último lote em andamento termina.
+    """
+
+    def __init__(self, number: int, engine, workers=1):
+        self.number = number
+        self.engine = engine
+        self.workers = workers
+        self.loaded_at = time.time()
+
+        if workers > 1:
+            # Processos filhos herdam as bases já carregadas (fork); initargs não são serializados
+            self.executor = concurrent.futures.ProcessPoolExecutor(workers, mp_context=mp.get_context('fork'), initializer=init_worker, initargs=(engine,))
+        else:
+            self.executor = concurrent.futures.ThreadPoolExecutor(1)
+
+        self.active = 0
+        self.retired = False
+
+    def enrich(self, loop, lines):
+        if self.workers > 1:
+            return loop.run_in_executor(self.executor, enrich_lines, lines)
+
+        return loop.run_in_executor(self.executor, enrich_lines, lines, self.engine)
+
+    def acquire(self):
+        self.active += 1
+
+    def release(self):
+        self.active -= 1
+
+        if self.retired and self.active == 0:
+            self.close()
+
+    def retire(self):
+        self.retired = True
+
+        if self.active == 0:
+            self.close()
+
+    def close(self):
+        logging.info(f'Encerrando geração {self.number} das bases de correção')
+        self.executor.shutdown(wait=False)
+
+
+async def read_line_chunks(content, chunk_size):
+    chunk = []
+
+    while True:
+        line = await content.readline()
+        if not line:
+            break
+
+        chunk.append(line.decode(enrich_references.DEFAULT_CHARSET, errors='replace'))
+
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+async def handle_enrich(request):
+    """
+    Recebe um lote de referências citadas (uma por linha, no formato de entrada configurado) e devolve,
+    à medida que cada bloco é processado, as referências enriquecidas em JSONL, na mesma ordem.
+    """
+    app = request.app
+    loop = asyncio.get_event_loop()
+    start_time = time.time()
+
+    # Lote é enriquecido inteiramente pela geração vigente ao seu início
+    generation = app['engine']['generation']
+    generation.acquire()
+
+    try:
+        response = web.StreamResponse()
+        response.content_type = 'application/x-ndjson'
+        response.charset = 'utf-8'
+        await response.prepare(request)
+
+        line_counter = 0
+        pending = collections.deque()
+
+        async for chunk in read_line_chunks(request.content, app['chunk_size']):
+            line_counter += len(chunk)
+            pending.append(generation.enrich(loop, chunk))
+
+            if len(pending) >= app['max_pending']:
+                await response.write((await pending.popleft()).encode('utf-8'))
+
+        while pending:
+            await response.write((await pending.popleft()).encode('utf-8'))
+
+        await response.write_eof()
+
+    finally:
+        generation.release()
+
+    app['stats']['requests'] += 1
+    app['stats']['lines'] += line_counter
+    logging.info(f'{line_counter} linha(s) enriquecida(s) pela geração {generation.number} em {time.time() - start_time:.3f}s')
+
+    return response
+
+
+async def handle_status(request):
+    app = request.app
+
+    generation = app['engine']['generation']
+
+    return web.json_response({
+        **app['stats'],
+        'workers': app['workers'],
+        'uptime': time.time() - app['start_time'],
+        'generation': generation.number,
+        'generation_loaded_at': generation.loaded_at,
+        'reloading': app['reload']['task'] is not None,
+    })
+
+
+async def reload_bases(app):
+    """
+    Carrega uma nova geração das bases de correção em segundo plano e a torna vigente de uma só vez.
+    Lotes em andamento terminam na geração anterior.
+    """
+    loop = asyncio.get_event_loop()
+    current = app['engine']['generation']
+
+    logging.info(f'Carregando geração {current.number + 1} das bases de correção...')
+    start_time = time.time()
+
+    try:
+        engine = await loop.run_in_executor(None, app['load_engine'])
+    except Exception:
+        logging.exception('Não foi possível carregar a nova geração das bases de correção; a geração atual foi mantida')
+        return
+
+    generation = EngineGeneration(current.number + 1, engine, app['workers'])
+    app['engine']['generation'] = generation
+    current.retire()
+
+    logging.info(f'Geração {generation.number} das bases de correção em uso (carregada em {time.time() - start_time:.1f}s)')
+
+
+def start_reload(app):
+    if app['reload']['task'] is not None:
+        logging.info('Recarga das bases de correção já está em andamento')
+        return False
+
+    task = asyncio.ensure_future(reload_bases(app))
+    task.add_done_callback(lambda t: app['reload'].update(task=None))
+    app['reload']['task'] = task
+
+    return True
+
+
+async def handle_reload(request):
+    started = start_reload(request.app)
+
+    return web.json_response({'reloading': True, 'started': started, 'generation': request.app['engine']['generation'].number}, status=202)
+
+
+def watched_signature(paths):
+    try:
+        return snapshot.source_signature({p: p for p in paths})
+    except OSError:
+        return None
+
+
+async def watch_bases(app, paths, interval):
+    """
+    Verifica periodicamente tamanho e data de modificação das bases; recarrega após uma alteração
+    que permaneça estável por um intervalo inteiro (bases ainda em gravação não são carregadas).
+    """
+    loaded_signature = watched_signature(paths)
+    previous_signature = loaded_signature
+
+    while True:
+        await asyncio.sleep(interval)
+
+        signature = watched_signature(paths)
+        if signature is not None and signature != loaded_signature and signature == previous_signature:
+            logging.info('Bases de correção alteradas em disco')
+            if start_reload(app):
+                loaded_signature = signature
+
+        previous_signature = signature
+
+
+async def start_background_tasks(app):
+    loop = asyncio.get_event_loop()
+
+    try:
+        loop.add_signal_handler(signal.SIGHUP, start_reload, app)
+    except (AttributeError, NotImplementedError):
+        ...
+
+    if app['watch']['interval'] > 0:
+        app['watch']['task'] = asyncio.ensure_future(watch_bases(app, app['watch']['paths'], app['watch']['interval']))
+
+
+async def stop_background_tasks(app):
+    if app['watch']['task'] is not None:
+        app['watch']['task'].cancel()
+
+    if app['reload']['task'] is not None:
+        app['reload']['task'].cancel()
+
+    app['engine']['generation'].retire()
+
+
+def create_app(engine, workers=1, max_pending=None, load_engine=None, watch_paths=None, watch_interval=0):
+    """
+    Cria a aplicação aiohttp que enriquece lotes com o motor informado.
+
+    Com workers > 1, os blocos são enriquecidos por um pool de processos que herdam as bases já carregadas (fork);
+    caso contrário, por uma única thread, para não bloquear o laço de eventos.
+
+    load_engine (função sem argumentos que devolve um novo motor) habilita a recarga das bases por POST /reload,
+    pelo sinal SIGHUP ou, com watch_interval > 0, quando algum dos arquivos em watch_paths é alterado.
+    """
+    app = web.Application()
+    # Geração vigente, substituída a cada recarga (estado mutável; a aplicação em si não é alterada após iniciada)
+    app['engine'] = {'generation': EngineGeneration(1, engine, workers)}
+    app['workers'] = workers
+    app['chunk_size'] = engine.chunk_size
+    app['max_pending'] = max_pending or max(workers, 1) * 2
+    app['stats'] = {'requests': 0, 'lines': 0}
+    app['start_time'] = time.time()
+
+    app['load_engine'] = load_engine
+    app['reload'] = {'task': None}
+    app['watch'] = {'task': None, 'paths': watch_paths or [], 'interval': watch_interval if load_engine else 0}
+
+    app.router.add_post('/enrich', handle_enrich)
+    app.router.add_get('/status', handle_status)
+
+    if load_engine is not None:
+        app.router.add_post('/reload', handle_reload)
+        app.on_startup.append(start_background_tasks)
+
+    app.on_cleanup.append(stop_background_tasks)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser()
+
+    enrich_references.add_engine_arguments(parser)
+
+    parser.add_argument(
+        '--host',
+        default=SERVER_HOST,
+        help='Endereço em que o serviço de enriquecimento escuta'
+    )
+
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=SERVER_PORT,
+        help='Porta em que o serviço de enriquecimento escuta'
+    )
+
+    parser.add_argument(
+        '--unix_socket',
+        help='Caminho de um socket Unix usado no lugar de --host e --port'
+    )
+
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Número de processos de enriquecimento; as bases de correção são carregadas uma vez e compartilhadas'
+    )
+
+    parser.add_argument(
+        '--watch_interval',
+        type=float,
+        default=0,
+        help='Intervalo, em segundos, de verificação de alterações nas bases de correção para recarregá-las; 0 desativa (POST /reload e SIGHUP continuam disponíveis)'
+    )
+
+    params = parser.parse_args()
+
+    logging.basicConfig(
+        level=LOGGING_LEVEL,
+        format='[%(asctime)s] %(levelname)s %(message)s',
+        datefmt='%d/%b/%Y %H:%M:%S',
+    )
+
+    watch_paths = [
+        params.title_to_issnl,
+        params.issnl_to_all,
+        params.title_year_volume_to_issn,
+        params.artifitial_title_year_volume_to_issn,
+        params.equations,
+        params.title_year_volume_index,
+        params.artifitial_title_year_volume_index,
+        params.snapshot,
+    ]
+
+    engine = enrich_references.build_engine(params)
+    app = create_app(
+        engine,
+        workers=params.workers,
+        load_engine=lambda: enrich_references.build_engine(params),
+        watch_paths=[p for p in watch_paths if p],
+        watch_interval=params.watch_interval,
+    )
+
+    if params.unix_socket:
+        logging.info(f'Serviço de enriquecimento disponível em {params.unix_socket}')
+        web.run_app(app, path=params.unix_socket)
+    else:
+        logging.info(f'Serviço de enriquecimento disponível em http://{params.host}:{params.port}/enrich')
+        web.run_app(app, host=params.host, port=params.port)
+
+    if params.title_cache:
+        saved_titles = standardizer.save_title_cache(params.title_cache)
+        logging.info(f'Cache de normalização de títulos ({saved_titles} título(s)) salvo em {params.title_cache}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+import argparse
+import logging
+import os
+
+from core.matchers.enrich_references import PREVIOUS_RESULT_PATTERN, clean_previous_results, detect_file_encoding
+from core.model.citation import Citation
+from core.util import sidecar
+from core.util import stream
+
+
+LOGGING_LEVEL = os.environ.get('LOGGING_LEVEL', logging.INFO)
+
+
+def join_sidecar(in_file: str, sidecar_file: str, out_file: str, input_format=None, encoding=None):
+    """
+    Une os campos de resultado de um arquivo sidecar às citações do arquivo de entrada, produzindo
+    a mesma saída do modo full. Linhas ausentes do sidecar (resultado prévio mantido) são copiadas byte a byte.
+    """
+    sidecar_header, records = sidecar.read_sidecar(sidecar_file)
+
+    # Entrada padrão, no enriquecimento ou na união, não tem tamanho a comparar
+    if in_file != stream.STDIO and sidecar_header['size'] is not None:
+        st = os.stat(in_file)
+        if st.st_size != sidecar_header['size']:
+            raise ValueError(f'{in_file} ({st.st_size} bytes) não é o arquivo enriquecido em {sidecar_file} ({sidecar_header["size"]} bytes)')
+
+        if st.st_mtime_ns != sidecar_header['mtime_ns']:
+            logging.warning(f'{in_file} foi modificado após o enriquecimento registrado em {sidecar_file}')
+
+    input_format = input_format or sidecar_header['input_format']
+
+    next_record = next(records, None)
+    line_counter = 0
+
+    with stream.open_output(out_file) as fout:
+        with stream.open_input(in_file, encoding=encoding or detect_file_encoding(in_file)) as fin:
+            for line in fin:
+                line_counter += 1
+
+                # Linha sem resultado no sidecar tem resultado prévio mantido; como no modo full (EnrichmentEngine.enrich_lines),
+                # linhas JSON reconhecidas pelo padrão são copiadas como estão, sem construir a citação
+                if next_record is None or next_record[0] != line_counter:
+                    if input_format == 'json' and PREVIOUS_RESULT_PATTERN.search(line):
+                        fout.write(line if line.endswith('\n') else line + '\n')
+                    else:
+                        fout.write(Citation(line, format=input_format).to_json() + '\n')
+                    continue
+
+                cit = Citation(line, format=input_format)
+                clean_previous_results(cit)
+
+                for k, v in next_record[1].items():
+                    cit.setattr(k, v)
+
+                next_record = next(records, None)
+
+                fout.write(cit.to_json() + '\n')
+
+    if next_record is not None:
+        raise ValueError(f'{sidecar_file} tem resultados para linhas além do fim de {in_file} ({line_counter} linhas)')
+
+    return line_counter
+
+
+def main():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        '--input',
+        required=True,
+        help='Arquivo de entrada enriquecido no modo sidecar; - lê da entrada padrão'
+    )
+
+    parser.add_argument(
+        '--sidecar',
+        required=True,
+        help='Arquivo sidecar gerado por enrich_references com --output_mode sidecar'
+    )
+
+    parser.add_argument(
+        '--output',
+        required=True,
+        help='Arquivo de resultados, isto é, com referências citadas enriquecidas; - grava na saída padrão'
+    )
+
+    parser.add_argument(
+        '--input_format',
+        choices=['csv', 'json'],
+        help='Formato de arquivo de entrada (por padrão, o registrado no sidecar)'
+    )
+
+    parser.add_argument(
+        '--encoding',
+        help='Codificação do arquivo de entrada; por padrão, detectada a partir de amostras do arquivo'
+    )
+
+    params = parser.parse_args()
+
+    logging.basicConfig(
+        level=LOGGING_LEVEL,
+        format='[%(asctime)s] %(levelname)s %(message)s',
+        datefmt='%d/%b/%Y %H:%M:%S',
+    )
+
+    logging.info(f'Unindo {params.sidecar} a {params.input} em {params.output}...')
+    line_counter = join_sidecar(params.input, params.sidecar, params.output, params.input_format, params.encoding)
+    logging.info(f'{line_counter} linha(s) gravada(s) em {params.output}')
+
+
+if __name__ == '__main__':
+    main()
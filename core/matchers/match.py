@@ -7,7 +7,7 @@ from core.util import file
 from core.model.citation import Citation
 
 
-def fuzzy_match(title: str, data: dict, standardize=False):
+def fuzzy_match(title: str, data: dict, standardize=False, index=None):
     words = title.split(' ')
 
     if standardize:
@@ -22,7 +22,12 @@ def fuzzy_match(title: str, data: dict, standardize=False):
 
         fuzzy_matches = []
 
-        for oficial_title in [ot for ot in data.keys() if ot.startswith(words[0])]:
+        if index is not None:
+            oficial_titles = index.candidates(words)
+        else:
+            oficial_titles = [ot for ot in data.keys() if ot.startswith(words[0])]
+
+        for oficial_title in oficial_titles:
             match = title_pattern.fullmatch(oficial_title)
 
             if match:
@@ -91,7 +96,7 @@ def main():
     params = parser.parse_args()
 
     print('Carregando base Title to ISSN-L...')
-    title2issnl = file.load_title_to_issnl(params.title_to_issnl)
+    title2issnl, title_buckets = file.load_title_to_issnl(params.title_to_issnl, buckets=True)
 
     print('Carregando base ISSN-L to All...')
     issn2issnl, issn2titles = file.load_issnl_to_all(params.issnl_to_all)
@@ -219,7 +224,7 @@ def main():
                             d_results['fuzzy-match-insufficient-data'].write(cit.attrs_str() + '\n')
 
                         else:
-                            fuzzy_match_issnls = fuzzy_match(cit_journal_title_cleaned, title2issnl)
+                            fuzzy_match_issnls = fuzzy_match(cit_journal_title_cleaned, title2issnl, index=title_buckets)
 
                             if len(fuzzy_match_issnls) > 0:
                                 fz_standardized_issnls = [standardizer.journal_issn(i) for i in fuzzy_match_issnls]
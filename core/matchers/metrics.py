@@ -0,0 +1,109 @@
+import collections
+import json
+import time
+
+from core.matchers import result_code
+
+
+# Nome de cada código de resultado (ex.: 0 -> SUCCESS_EXACT_MATCH)
+RESULT_CODE_NAMES = {v: k for k, v in vars(result_code).items() if k.isupper() and isinstance(v, int)}
+
+# Fases do enriquecimento de um bloco, na ordem em que ocorrem
+PHASES = ['parse', 'prefetch', 'match', 'serialize', 'write']
+
+
+class EnrichmentMetrics:
+    """
+    Contadores acumulados de uma execução de enriquecimento.
+
+    Linhas lidas, resultados prévios mantidos (kept) e citações por código de resultado.
+    Trios título-ano-volume distintos por bloco (groups) e correspondências efetivamente executadas (matched).
+    Tempo por fase do processamento dos blocos (PHASES).
+    Chamadas, decisões e tempo por etapa de correspondência (stages).
+
+    to_dict produz um dicionário serializável (enviado pelos processos filhos a cada bloco) que merge soma a outro;
+    com vários processos, o tempo por fase e por etapa é a soma dos tempos de todos eles.
+    """
+
+    def __init__(self):
+        self.lines = 0
+        self.kept = 0
+        self.groups = 0
+        self.matched = 0
+        self.result_codes = collections.Counter()
+        self.phases = collections.Counter()
+        self.stages = {}
+
+    def add_stages(self, stages: dict):
+        for name, stage_stats in stages.items():
+            totals = self.stages.setdefault(name, {'calls': 0, 'decisions': 0, 'elapsed': 0.0})
+
+            for k, v in stage_stats.items():
+                totals[k] += v
+
+    def merge(self, data: dict):
+        self.lines += data['lines']
+        self.kept += data['kept']
+        self.groups += data['groups']
+        self.matched += data['matched']
+        self.result_codes.update(data['result_codes'])
+        self.phases.update(data['phases'])
+        self.add_stages(data['stages'])
+
+    def to_dict(self):
+        return {
+            'lines': self.lines,
+            'kept': self.kept,
+            'groups': self.groups,
+            'matched': self.matched,
+            'result_codes': dict(self.result_codes),
+            'phases': dict(self.phases),
+            'stages': {name: dict(stage_stats) for name, stage_stats in self.stages.items()},
+        }
+
+    def report(self, elapsed: float, **extra):
+        """
+        Resumo da execução, com vazão em linhas por segundo e códigos de resultado identificados pelo nome.
+        """
+        return {
+            **extra,
+            'elapsed': elapsed,
+            'lines': self.lines,
+            'lines_per_second': self.lines / elapsed if elapsed > 0 else 0.0,
+            'kept': self.kept,
+            'groups': self.groups,
+            'matched': self.matched,
+            'result_codes': {
+                RESULT_CODE_NAMES.get(code, str(code)): {'code': code, 'count': count}
+                for code, count in sorted(self.result_codes.items())
+            },
+            'phases': {p: self.phases[p] for p in PHASES if p in self.phases},
+            'stages': self.stages,
+        }
+
+    def summary_lines(self, elapsed: float):
+        """
+        Linhas de log com o resumo da execução.
+        """
+        lines = [f'{self.lines} linha(s) em {elapsed:.1f}s ({self.lines / elapsed if elapsed > 0 else 0.0:.0f} linhas/s); {self.kept} com resultado prévio mantido']
+
+        lines.append(f'{self.groups} trio(s) título-ano-volume distinto(s) nos blocos; {self.matched} submetido(s) à correspondência, os demais resolvidos pelo cache')
+
+        for p in PHASES:
+            if p in self.phases:
+                lines.append(f'Fase {p}: {self.phases[p]:.2f}s')
+
+        for name, stage_stats in self.stages.items():
+            lines.append(f'Etapa {name}: {stage_stats["calls"]} chamadas, {stage_stats["decisions"]} decisões em {stage_stats["elapsed"]:.2f}s')
+
+        total = sum(self.result_codes.values())
+        for code, count in sorted(self.result_codes.items()):
+            lines.append(f'Código {code} ({RESULT_CODE_NAMES.get(code, "?")}): {count} ({count / total:.2%})')
+
+        return lines
+
+
+def save_metrics(path: str, report: dict):
+    with open(path, 'w') as fout:
+        json.dump({'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'), **report}, fout, indent=2, ensure_ascii=False)
+        fout.write('\n')
@@ -1,4 +1,4 @@
-import json
+from core.util import json_backend
 
 
 CITATION_ROW_KEYS_SCIELO = [
@@ -63,15 +63,15 @@ class Citation:
 
     def load_from_json(self, data, keys):
         try:
-            json_data = json.loads(data)
-        except json.JSONDecodeError:
+            json_data = json_backend.loads(data)
+        except json_backend.JSONDecodeError:
             json_data = {'error': 'it was not possible to load the citation'}
 
-        for k in json_data.keys():
-            setattr(self, k, json_data[k])
+        # Atributos da citação são os próprios campos do JSON, copiados de uma vez para __dict__
+        self.__dict__.update(json_data)
 
     def to_json(self):
-        return json.dumps(self, default=lambda o: o.__dict__, sort_keys=True, ensure_ascii=False)
+        return json_backend.dumps(self.__dict__)
 
     def setattr(self, key, value):
-        setattr(self, key, value)
+        self.__dict__[key] = value
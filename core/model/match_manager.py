@@ -1,28 +1,528 @@
-#!/usr/bin/env python3
 import os
-import sys
-sys.path.append(os.getcwd())
+import re
+import time
+
+from core.matchers.result_code import *
+from core.util import cached_standardizer as standardizer
+
+
+MIN_WORD_LENGTH = int(os.environ.get('MIN_WORD_LENGTH', '2'))
+MIN_TITLE_LENGTH = int(os.environ.get('MIN_TITLE_LENGTH', '6'))
+MIN_WORDS_NUMBER = int(os.environ.get('MIN_WORDS_NUMBER', '2'))
+MIN_COMPARABLE_WORDS_NUMBER = int(os.environ.get('MIN_COMPARABLE_WORDS_NUMBER', '2'))
+
+DEFAULT_STAGE_ORDER = ['exact', 'fuzzy', 'year_volume', 'inferred', 'artificial', 'artificial_inferred']
+
+# Etapas que obtêm os ISSN-Ls candidatos; as demais os desambiguam
+CANDIDATE_STAGES = ['exact', 'fuzzy']
+
+
+def fuzzy_match(title: str, data: dict, standardize=False, index=None):
+    words = title.split(' ')
+
+    if standardize:
+        cleaned_title = standardizer.journal_title_for_deduplication(title).upper()
+    else:
+        cleaned_title = title
+
+    valid_words = [w for w in words if len(w) >= MIN_WORD_LENGTH]
+
+    if len(cleaned_title) >= MIN_TITLE_LENGTH and len(words) >= MIN_WORDS_NUMBER and len(valid_words) >= MIN_COMPARABLE_WORDS_NUMBER:
+        pattern = r'[\w|\s]*'.join([word for word in words]) + '[\w|\s]*'
+
+        title_pattern = re.compile(pattern, re.UNICODE)
+
+        fuzzy_matches = []
+
+        if index is not None:
+            oficial_titles = index.candidates(words)
+        else:
+            oficial_titles = [ot for ot in data.keys() if ot.startswith(words[0])]
+
+        for oficial_title in oficial_titles:
+            match = title_pattern.fullmatch(oficial_title)
+
+            if match:
+                fuzzy_matches.extend(data[oficial_title].split('#'))
+
+        return set(fuzzy_matches)
+
+    return set()
+
+
+def infer_volume(issn: str, year: int, data: dict):
+    if issn in data:
+        a, b = data[issn]
+        return round(a + (b * year))
+
+
+def infer_volumes(issns: list, year: int, data):
+    # Tabela vetorizada (VolumeInferenceTable) infere todos os volumes num único cálculo
+    if hasattr(data, 'infer'):
+        return data.infer(issns, year)
+
+    return [infer_volume(i, year, data) for i in issns]
+
+
+def get_issns_list_sign(issn_list):
+    return '#'.join(sorted(issn_list))
+
+
+def get_titles(issn_list, issn2titles):
+    titles = set()
+
+    for i in issn_list:
+        titles = titles.union(issn2titles.get(i, set()))
+
+    return titles
+
+
+def match_year_volume(title_year_volume_key, bases, issnls_std, success_code):
+    values = set()
+    for base in bases:
+        values = values.union(base.get(title_year_volume_key, set()))
+
+    if len(values) == 1:
+        standardized_issn = standardizer.journal_issn(list(values)[0])
+
+        if standardized_issn in issnls_std:
+            return {
+                'cited_issnl': standardized_issn,
+                'result_code': success_code,
+                'title_year_volume_key': title_year_volume_key,
+            }
+
+
+def match_year_volume_inferred(title, year, issnls, issnls_std, title_year_volume2issn, issn2equations, success_code, error_code):
+    result_issn_to_data = {'issns': set(), 'tyv_keys': {}}
+    for cit_volume_inferred in infer_volumes(issnls, int(year), issn2equations):
+        if cit_volume_inferred:
+            for voli in [vi for vi in range(cit_volume_inferred - 1, cit_volume_inferred + 2) if vi > 0]:
+                tyv_key = '-'.join([
+                    title,
+                    year,
+                    str(voli)
+                ])
+
+                possible_issnls = title_year_volume2issn.get(tyv_key, set())
+                if len(possible_issnls) > 0:
+                    result_issn_to_data['issns'] = result_issn_to_data['issns'].union(possible_issnls)
+
+                    possible_issnls_sign = get_issns_list_sign(possible_issnls)
+                    if possible_issnls_sign not in result_issn_to_data['tyv_keys']:
+                        result_issn_to_data['tyv_keys'][possible_issnls_sign] = set()
+
+                    result_issn_to_data['tyv_keys'][possible_issnls_sign].add(tyv_key)
+
+                if len(result_issn_to_data['issns']) > 1:
+                    return {'result_code': error_code}
+
+    if len(result_issn_to_data['issns']) == 1:
+        matched_issn = list(result_issn_to_data['issns'])[0]
+        matched_issn_std = standardizer.journal_issn(matched_issn)
+        matched_tyv_key = list(result_issn_to_data['tyv_keys'][matched_issn])[0]
+
+        if matched_issn_std in issnls_std:
+            return {
+                'cited_issnl': matched_issn_std,
+                'result_code': success_code,
+                'title_year_volume_key': matched_tyv_key,
+            }
+
+
+def match_fuzzy_year_volume(tyv_keys, title_year_volume2issn, fuzzy_match_issnls, success_code, error_code):
+    """
+    Valida uma correspondência inexata pelas chaves título-ano-volume informadas, na ordem em que são geradas.
+    """
+    fz_result_issn_to_data = {'issns': set(), 'tyv_keys': {}}
+    for fz_tyv_key in tyv_keys:
+        fz_possible_issnls = title_year_volume2issn.get(fz_tyv_key, set())
+        if len(fz_possible_issnls) > 0:
+            fz_result_issn_to_data['issns'] = fz_result_issn_to_data['issns'].union(fz_possible_issnls)
+
+            fz_possible_issnls_sign = get_issns_list_sign(fz_possible_issnls)
+            if fz_possible_issnls_sign not in fz_result_issn_to_data['tyv_keys']:
+                fz_result_issn_to_data['tyv_keys'][fz_possible_issnls_sign] = set()
+            fz_result_issn_to_data['tyv_keys'][fz_possible_issnls_sign].add(fz_tyv_key)
+
+            if len(fz_result_issn_to_data['issns']) > 1:
+                return {'result_code': error_code}
+
+    if len(fz_result_issn_to_data['issns']) == 1:
+        fz_matched_issn = list(fz_result_issn_to_data['issns'])[0]
+        fz_matched_issn_std = standardizer.journal_issn(fz_matched_issn)
+        fz_matched_tyv_key = list(fz_result_issn_to_data['tyv_keys'][fz_matched_issn])[0]
+
+        if fz_matched_issn in fuzzy_match_issnls:
+            return {
+                'cited_issnl': fz_matched_issn_std,
+                'result_code': success_code,
+                'title_year_volume_key': fz_matched_tyv_key,
+            }
+
+
+def exact_disambiguation_stages(stage_order):
+    """
+    Etapas de desambiguação que decidem os títulos homônimos da correspondência exata: as que seguem a etapa exact.
+    """
+    if 'exact' not in stage_order:
+        return []
+
+    return [s for s in stage_order[stage_order.index('exact') + 1:] if s not in CANDIDATE_STAGES]
+
+
+class HomonymTable(dict):
+    """
+    Decisões pré-calculadas das etapas de desambiguação para os títulos homônimos (título -> etapa -> chave -> resultado).
+
+    stages registra as etapas consideradas, na ordem em que são consultadas; a tabela equivale às etapas
+    de desambiguação que seguem a etapa exact em uma ordem de etapas (exact_disambiguation_stages).
+    """
+
+    # Etapas decididas pela chave título-ano-volume; as demais, pelo ano (volume inferido)
+    KEYED_BY_VOLUME = {'year_volume', 'artificial'}
+
+    def __init__(self, stages):
+        super().__init__()
+        self.stages = list(stages)
+
+    def lookup(self, title, year, volume):
+        entry = self[title]
+        title_year_volume_key = '-'.join([title, year, volume])
+
+        for stage in self.stages:
+            if stage in self.KEYED_BY_VOLUME:
+                if volume != '' and title_year_volume_key in entry[stage]:
+                    return entry[stage][title_year_volume_key]
+
+            elif year in entry[stage]:
+                return entry[stage][year]
+
+        return {'result_code': ERROR_EXACT_MATCH_UNDECIDABLE}
+
+
+class MatchQuery:
+    """
+    Dados essenciais de uma citação e ISSN-Ls candidatos obtidos pela correspondência (exata ou inexata) de título.
+    """
+
+    def __init__(self, title: str, year: str, volume: str):
+        self.title = title
+        self.year = year
+        self.volume = volume
+
+        self.method = None
+        self.issnls = None
+        self.issnls_std = None
+
+    @property
+    def title_year_volume_key(self):
+        return '-'.join([self.title, self.year, self.volume])
+
+
+class Stage:
+    """
+    Etapa de correspondência. run devolve um resultado (encerrando a correspondência) ou None (passa à próxima etapa).
+    """
+
+    name = ''
+
+    def __init__(self):
+        self.reset_stats()
+
+    def __call__(self, query: MatchQuery):
+        start = time.perf_counter()
+        result = self.run(query)
+        self.elapsed += time.perf_counter() - start
+
+        self.calls += 1
+        if result is not None:
+            self.decisions += 1
+
+        return result
+
+    def run(self, query: MatchQuery):
+        raise NotImplementedError
+
+    def reset_stats(self):
+        self.calls = 0
+        self.decisions = 0
+        self.elapsed = 0.0
+
+    def stats(self):
+        return {
+            'calls': self.calls,
+            'decisions': self.decisions,
+            'elapsed': self.elapsed,
+        }
+
+
+class ExactStage(Stage):
+    """
+    Correspondência exata na base Título de periódico -> ISSN-L; títulos homônimos podem ser decididos pela tabela pré-calculada.
+    """
+
+    name = 'exact'
+
+    def __init__(self, title2issnl, homonym_table=None):
+        super().__init__()
+        self.title2issnl = title2issnl
+        self.homonym_table = homonym_table
+
+    def run(self, query):
+        if query.method is not None or query.title not in self.title2issnl:
+            return
+
+        query.method = 'exact'
+        query.issnls = self.title2issnl.get(query.title, '').split('#')
+        query.issnls_std = [standardizer.journal_issn(i) for i in query.issnls]
+
+        # Correspondência exata com apenas um ISSN-L
+        if len(query.issnls) == 1:
+            return {'cited_issnl': query.issnls_std[0], 'result_code': SUCCESS_EXACT_MATCH}
+
+        # Não há dados de ano para fazer desambiguação
+        if not query.year.isdigit():
+            return {'result_code': ERROR_EXACT_MATCH_INVALID_YEAR}
+
+        # Decisão pré-calculada para o título
+        if self.homonym_table is not None and query.title in self.homonym_table:
+            return self.homonym_table.lookup(query.title, query.year, query.volume)
+
+
+class FuzzyStage(Stage):
+    """
+    Correspondência inexata (expressão regular) na base Título de periódico -> ISSN-L, opcionalmente com índice de palavras.
+    """
+
+    name = 'fuzzy'
+
+    def __init__(self, title2issnl, title_index=None, enabled=True):
+        super().__init__()
+        self.title2issnl = title2issnl
+        self.title_index = title_index
+        self.enabled = enabled
+
+    def run(self, query):
+        if query.method is not None:
+            return
+
+        # Não tentou fazer correspondência
+        if not self.enabled:
+            return {'result_code': NOT_CONDUCTED_MATCH_FORCED_BY_USER}
+
+        # Não há dados suficientes para validar uma possível correspondência inexata
+        if not query.year.isdigit():
+            return {'result_code': ERROR_FUZZY_MATCH_INVALID_YEAR}
+
+        fuzzy_match_issnls = fuzzy_match(query.title, self.title2issnl, index=self.title_index)
+
+        # Não houve correspondência inexata
+        if len(fuzzy_match_issnls) == 0:
+            return {'result_code': ERROR_JOURNAL_TITLE_NOT_FOUND}
+
+        query.method = 'fuzzy'
+        query.issnls = fuzzy_match_issnls
+
+
+class DisambiguationStage(Stage):
+    """
+    Etapa que decide entre os ISSN-Ls candidatos de uma correspondência exata (run_exact) ou inexata (run_fuzzy).
+    """
+
+    def run(self, query):
+        if query.method == 'exact':
+            return self.run_exact(query)
+
+        if query.method == 'fuzzy':
+            return self.run_fuzzy(query)
+
+    def run_exact(self, query):
+        raise NotImplementedError
+
+    def run_fuzzy(self, query):
+        raise NotImplementedError
+
+
+class YearVolumeStage(DisambiguationStage):
+    """
+    Usa chave título-ano-volume em busca na base real.
+    """
+
+    name = 'year_volume'
+
+    def __init__(self, title_year_volume2issn, issn2titles):
+        super().__init__()
+        self.title_year_volume2issn = title_year_volume2issn
+        self.issn2titles = issn2titles
+
+    def run_exact(self, query):
+        if query.volume != '':
+            return match_year_volume(query.title_year_volume_key, [self.title_year_volume2issn], query.issnls_std, SUCCESS_EXACT_MATCH_YEAR_VOL)
+
+    def run_fuzzy(self, query):
+        if query.volume != '':
+            tyv_keys = ('-'.join([t, query.year, query.volume]) for t in get_titles(query.issnls, self.issn2titles))
+            return match_fuzzy_year_volume(tyv_keys, self.title_year_volume2issn, query.issnls, SUCCESS_FUZZY_MATCH_YEAR_VOL, ERROR_FUZZY_MATCH_YEAR_VOL)
+
+
+class InferredStage(DisambiguationStage):
+    """
+    Usa chave título-ano com volume inferido em busca na base real.
+    """
+
+    name = 'inferred'
+
+    def __init__(self, title_year_volume2issn, issn2equations):
+        super().__init__()
+        self.title_year_volume2issn = title_year_volume2issn
+        self.issn2equations = issn2equations
+
+    def run_exact(self, query):
+        return match_year_volume_inferred(query.title, query.year, query.issnls, query.issnls_std, self.title_year_volume2issn, self.issn2equations, SUCCESS_EXACT_MATCH_YEAR_VOL_INF, ERROR_EXACT_MATCH_YEAR_VOL_INF)
+
+    def run_fuzzy(self, query):
+        return match_fuzzy_year_volume(self.tyv_keys(query), self.title_year_volume2issn, query.issnls, SUCCESS_FUZZY_MATCH_YEAR_VOL_INF, ERROR_FUZZY_MATCH_YEAR_VOL_INF)
+
+    def tyv_keys(self, query):
+        for volume_inferred in infer_volumes(query.issnls, int(query.year), self.issn2equations):
+            if volume_inferred:
+                for voli in [vi for vi in range(volume_inferred - 1, volume_inferred + 2) if vi > 0]:
+                    yield '-'.join([query.title, query.year, str(voli)])
+
+
+class ArtificialStage(DisambiguationStage):
+    """
+    Usa chave título-ano-volume em busca na base artificial.
+    """
+
+    name = 'artificial'
+
+    def __init__(self, artifitial_title_year_volume2issn, title_year_volume2issn, issn2titles):
+        super().__init__()
+        self.artifitial_title_year_volume2issn = artifitial_title_year_volume2issn
+        self.title_year_volume2issn = title_year_volume2issn
+        self.issn2titles = issn2titles
+
+    def run_exact(self, query):
+        if query.volume != '':
+            return match_year_volume(query.title_year_volume_key, [self.artifitial_title_year_volume2issn, self.title_year_volume2issn], query.issnls_std, SUCCESS_EXACT_MATCH_YEAR_VOL_ART)
+
+    def run_fuzzy(self, query):
+        if query.volume != '':
+            tyv_keys = ('-'.join([t, query.year, query.volume]) for t in get_titles(query.issnls, self.issn2titles))
+            return match_fuzzy_year_volume(tyv_keys, self.artifitial_title_year_volume2issn, query.issnls, SUCCESS_FUZZY_MATCH_YEAR_VOL_ART, ERROR_FUZZY_MATCH_YEAR_VOL_ART)
+
+
+class ArtificialInferredStage(DisambiguationStage):
+    """
+    Usa chave título-ano com volume inferido em busca na base artificial.
+    """
+
+    name = 'artificial_inferred'
+
+    def __init__(self, artifitial_title_year_volume2issn, issn2equations, issn2titles):
+        super().__init__()
+        self.artifitial_title_year_volume2issn = artifitial_title_year_volume2issn
+        self.issn2equations = issn2equations
+        self.issn2titles = issn2titles
+
+    def run_exact(self, query):
+        return match_year_volume_inferred(query.title, query.year, query.issnls, query.issnls_std, self.artifitial_title_year_volume2issn, self.issn2equations, SUCCESS_EXACT_MATCH_YEAR_VOL_INF_ART, ERROR_EXACT_MATCH_YEAR_VOL_INF_ART)
+
+    def run_fuzzy(self, query):
+        return match_fuzzy_year_volume(self.tyv_keys(query), self.artifitial_title_year_volume2issn, query.issnls, SUCCESS_FUZZY_MATCH_YEAR_VOL_INF_ART, ERROR_FUZZY_MATCH_YEAR_VOL_INF_ART)
+
+    def tyv_keys(self, query):
+        for i, volume_inferred in zip(query.issnls, infer_volumes(query.issnls, int(query.year), self.issn2equations)):
+            if volume_inferred:
+                for voli in [vi for vi in range(volume_inferred - 1, volume_inferred + 2) if vi > 0]:
+                    for t in get_titles([i], self.issn2titles):
+                        yield '-'.join([t, query.year, str(voli)])
 
 
 class MatchManager:
-	def __init__(self):
-		self.base_title = {}
-		self.base_year_volume = {}
+    """
+    Motor de correspondência em etapas: as etapas são executadas na ordem configurada até que uma delas decida o resultado.
+
+    As etapas exact e fuzzy obtêm os ISSN-Ls candidatos; as demais desambiguam os candidatos pelas bases título-ano-volume.
+    Cada etapa mantém referências às suas bases (a construção não copia dados) e contadores de chamadas, decisões e tempo.
+    """
+
+    def __init__(self, title2issnl, issn2titles, title_year_volume2issn, artifitial_title_year_volume2issn, issn2equations, use_fuzzy=False, title_index=None, homonym_table=None, stage_order=None):
+        self.stages = {
+            'exact': ExactStage(title2issnl, homonym_table),
+            'fuzzy': FuzzyStage(title2issnl, title_index, enabled=use_fuzzy),
+            'year_volume': YearVolumeStage(title_year_volume2issn, issn2titles),
+            'inferred': InferredStage(title_year_volume2issn, issn2equations),
+            'artificial': ArtificialStage(artifitial_title_year_volume2issn, title_year_volume2issn, issn2titles),
+            'artificial_inferred': ArtificialInferredStage(artifitial_title_year_volume2issn, issn2equations, issn2titles),
+        }
+
+        self.set_stage_order(stage_order or DEFAULT_STAGE_ORDER)
+
+    def set_stage_order(self, stage_order: list):
+        unknown = [s for s in stage_order if s not in self.stages]
+        if unknown:
+            raise ValueError(f'Etapa(s) de correspondência desconhecida(s): {", ".join(unknown)}')
+
+        # Etapas de desambiguação dependem dos candidatos obtidos por uma etapa anterior (exact ou fuzzy)
+        candidate_positions = [i for i, s in enumerate(stage_order) if not isinstance(self.stages[s], DisambiguationStage)]
+        if not candidate_positions:
+            raise ValueError('A ordem das etapas de correspondência não contém etapa de obtenção de candidatos (exact ou fuzzy)')
+
+        premature = stage_order[:candidate_positions[0]]
+        if premature:
+            raise ValueError(f'Etapa(s) de desambiguação antes de qualquer etapa de obtenção de candidatos (exact ou fuzzy): {", ".join(premature)}')
+
+        # A tabela de títulos homônimos substitui as etapas de desambiguação que seguem exact e só vale para as mesmas etapas
+        homonym_table = self.stages['exact'].homonym_table
+        if homonym_table is not None and 'exact' in stage_order and homonym_table.stages != exact_disambiguation_stages(stage_order):
+            raise ValueError(
+                f'Tabela de títulos homônimos calculada para as etapas {",".join(homonym_table.stages) or "(nenhuma)"} após exact, '
+                f'mas a ordem configurada executa {",".join(exact_disambiguation_stages(stage_order)) or "(nenhuma)"}'
+            )
+
+        self.stage_order = list(stage_order)
+        self.pipeline = [self.stages[s] for s in self.stage_order]
+
+    def exact(self, query_title: str):
+        issnls = self.stages['exact'].title2issnl.get(query_title)
+        if issnls is not None:
+            return issnls.split('#')
+
+    def fuzzy(self, query_title: str):
+        fuzzy_stage = self.stages['fuzzy']
+        return fuzzy_match(query_title, fuzzy_stage.title2issnl, index=fuzzy_stage.title_index)
+
+    def match(self, title: str, year: str, volume: str):
+        query = MatchQuery(title, year, volume)
 
-	def exact(self, query_title: str):
-		pass
+        decision = None
+        for stage in self.pipeline:
+            decision = stage(query)
+            if decision is not None:
+                break
 
-	def fuzzy(self, query_title: str):
-		pass
+        if decision is None:
+            # Não foi possível decidir qual é o ISSN-L correto
+            if query.method == 'exact':
+                decision = {'result_code': ERROR_EXACT_MATCH_UNDECIDABLE}
+            elif query.method == 'fuzzy':
+                decision = {'result_code': ERROR_FUZZY_MATCH_UNDECIDABLE}
+            else:
+                decision = {'result_code': ERROR_JOURNAL_TITLE_NOT_FOUND}
 
-	def load_base_title():
-		pass
+        result = {}
+        if query.issnls is not None:
+            result['issnls_size'] = len(query.issnls)
+        result.update(decision)
 
-	def load_base_year_volume():
-		pass
+        return result
 
-	def match_base_title():
-		pass
+    def stats(self):
+        return {name: self.stages[name].stats() for name in self.stage_order}
 
-	def match_base_year_volume():
-		pass
+    def reset_stats(self):
+        for stage in self.stages.values():
+            stage.reset_stats()
@@ -0,0 +1,172 @@
+import bisect
+import re
+
+from array import array
+
+from core.util.cache import LRUCache
+
+
+# Tamanho dos trechos indexados do vocabulário na busca de palavras por trecho
+NGRAM_SIZE = 3
+
+
+class TitleIndex:
+    """
+    Índice invertido (palavra -> lista de ids de títulos) da base Título de periódico -> ISSN-L.
+
+    Gera o mesmo conjunto de títulos candidatos que a busca por expressão regular de fuzzy_match
+    (títulos que começam pela primeira palavra e contêm as demais palavras, em ordem), sem varrer
+    todas as chaves da base. Os candidatos devem ser confirmados pela expressão regular.
+    """
+
+    def __init__(self, title_to_issnl: dict, substring_cache_size=100000):
+        self.titles = sorted(title_to_issnl.keys())
+
+        word_to_ids = {}
+        for title_id, title in enumerate(self.titles):
+            for word in set(title.split(' ')):
+                if word:
+                    word_to_ids.setdefault(word, []).append(title_id)
+
+        # Listas de ids são armazenadas em arrays de inteiros sem sinal (4 bytes por id)
+        self.word_to_ids = {w: array('I', ids) for w, ids in word_to_ids.items()}
+        self.words = list(self.word_to_ids.keys())
+
+        # Índice de trigramas do vocabulário (trigrama -> ids de palavras, em ordem crescente)
+        ngram_to_word_ids = {}
+        for word_id, word in enumerate(self.words):
+            for ngram in {word[i:i + NGRAM_SIZE] for i in range(len(word) - NGRAM_SIZE + 1)}:
+                ngram_to_word_ids.setdefault(ngram, []).append(word_id)
+
+        self.ngram_to_word_ids = {n: array('I', ids) for n, ids in ngram_to_word_ids.items()}
+
+        self._substring_cache = LRUCache(substring_cache_size)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def prefix_range(self, prefix: str):
+        """
+        Obtém o intervalo [inicio, fim) de ids dos títulos que começam por prefix.
+        """
+        start = bisect.bisect_left(self.titles, prefix)
+
+        if not prefix:
+            return start, len(self.titles)
+
+        end = bisect.bisect_left(self.titles, prefix[:-1] + chr(ord(prefix[-1]) + 1), lo=start)
+        return start, end
+
+    def words_containing(self, text: str):
+        """
+        Obtém as palavras do vocabulário que contêm text.
+
+        As candidatas são as palavras com o trigrama de text menos frequente, confirmadas por comparação de trechos;
+        textos menores que um trigrama são procurados em todo o vocabulário. Os resultados são mantidos em cache (LRU).
+        """
+        words = self._substring_cache.get(text)
+        if words is not None:
+            return words
+
+        if len(text) < NGRAM_SIZE:
+            words = [w for w in self.words if text in w]
+
+        else:
+            postings = [self.ngram_to_word_ids.get(text[i:i + NGRAM_SIZE]) for i in range(len(text) - NGRAM_SIZE + 1)]
+
+            if any(p is None for p in postings):
+                words = []
+            else:
+                words = [self.words[i] for i in min(postings, key=len) if text in self.words[i]]
+
+        self._substring_cache.put(text, words)
+
+        return words
+
+    def ids_containing(self, text: str, start: int, end: int):
+        """
+        Obtém os ids, no intervalo [start, end), dos títulos que têm alguma palavra contendo text.
+        """
+        ids = set()
+
+        for w in self.words_containing(text):
+            posting = self.word_to_ids[w]
+            i = bisect.bisect_left(posting, start)
+            j = bisect.bisect_left(posting, end, lo=i)
+            if i < j:
+                ids.update(posting[i:j])
+
+        return ids
+
+    def candidates(self, words: list):
+        """
+        Obtém os títulos que começam por words[0] e contêm, como trechos de palavras, todas as demais.
+        """
+        start, end = self.prefix_range(words[0])
+
+        # Palavras com metacaracteres de expressão regular não correspondem a trechos literais
+        if any(re.escape(w) != w for w in words[1:]):
+            return self.titles[start:end]
+
+        candidate_ids = None
+        for w in words[1:]:
+            if not w:
+                continue
+
+            w_ids = self.ids_containing(w, start, end)
+
+            if candidate_ids is None:
+                candidate_ids = w_ids
+            else:
+                candidate_ids.intersection_update(w_ids)
+
+            if not candidate_ids:
+                return []
+
+        if candidate_ids is None:
+            return self.titles[start:end]
+
+        return [self.titles[i] for i in sorted(candidate_ids)]
+
+
+class TitleBuckets:
+    """
+    Tabela de títulos da base Título de periódico -> ISSN-L agrupados pela primeira palavra.
+
+    As primeiras palavras também são agrupadas por seus caracteres iniciais (até prefix_length),
+    de modo que os títulos que começam por uma palavra qualquer são obtidos visitando apenas o grupo
+    correspondente, e não todas as chaves da base.
+    """
+
+    def __init__(self, title_to_issnl: dict, prefix_length=3):
+        self.prefix_length = prefix_length
+        self.titles = list(title_to_issnl.keys())
+
+        self.first_word_to_titles = {}
+        for title in self.titles:
+            self.first_word_to_titles.setdefault(title.split(' ', 1)[0], []).append(title)
+
+        self.prefix_to_first_words = {}
+        for first_word in self.first_word_to_titles:
+            for prefix in {first_word[:i] for i in range(1, prefix_length + 1)}:
+                self.prefix_to_first_words.setdefault(prefix, []).append(first_word)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def bucket(self, word: str):
+        """
+        Obtém os títulos que começam por word.
+        """
+        if not word:
+            return self.titles
+
+        titles = []
+        for first_word in self.prefix_to_first_words.get(word[:self.prefix_length], []):
+            if first_word.startswith(word):
+                titles.extend(self.first_word_to_titles[first_word])
+
+        return titles
+
+    def candidates(self, words: list):
+        return self.bucket(words[0])
@@ -0,0 +1,74 @@
+import numpy as np
+
+
+class VolumeInferenceTable:
+    """
+    Tabela de regressões lineares ISSN -> (a, b) armazenada em arrays NumPy.
+
+    Mantém a interface de leitura do dicionário produzido por file.load_equations (in, [], get, len)
+    e infere volumes (round(a + b * ano)) de vários pares (ISSN, ano) num único cálculo vetorizado.
+    Volumes já inferidos são mantidos em memória (até memo_size pares).
+    """
+
+    def __init__(self, issn_to_equation: dict, memo_size=1000000):
+        self.issn_to_row = {}
+
+        a = []
+        b = []
+        for issn, (issn_a, issn_b) in issn_to_equation.items():
+            self.issn_to_row[issn] = len(a)
+            a.append(issn_a)
+            b.append(issn_b)
+
+        self.a = np.array(a, dtype=np.float64)
+        self.b = np.array(b, dtype=np.float64)
+
+        self.memo_size = memo_size
+        self._memo = {}
+
+    def __contains__(self, issn):
+        return issn in self.issn_to_row
+
+    def __getitem__(self, issn):
+        row = self.issn_to_row[issn]
+        return float(self.a[row]), float(self.b[row])
+
+    def __iter__(self):
+        return iter(self.issn_to_row)
+
+    def __len__(self):
+        return len(self.issn_to_row)
+
+    def get(self, issn, default=None):
+        if issn in self.issn_to_row:
+            return self[issn]
+        return default
+
+    def infer_many(self, issn_year_pairs):
+        """
+        Obtém os volumes inferidos para uma lista de pares (ISSN, ano); ISSNs sem regressão resultam em None.
+        """
+        missing = [p for p in dict.fromkeys(issn_year_pairs) if p not in self._memo]
+
+        if missing:
+            if len(self._memo) + len(missing) > self.memo_size:
+                self._memo.clear()
+
+            rows = np.array([self.issn_to_row.get(issn, -1) for issn, year in missing], dtype=np.int64)
+            years = np.array([year for issn, year in missing], dtype=np.float64)
+            known = rows >= 0
+
+            # np.rint arredonda metades para o par mais próximo, como round
+            volumes = np.rint(self.a[rows[known]] + (self.b[rows[known]] * years[known])).astype(np.int64).tolist()
+            volumes_iter = iter(volumes)
+
+            for pair, is_known in zip(missing, known.tolist()):
+                self._memo[pair] = next(volumes_iter) if is_known else None
+
+        return [self._memo[p] for p in issn_year_pairs]
+
+    def infer(self, issns, year: int):
+        """
+        Obtém os volumes inferidos de vários ISSNs para um mesmo ano.
+        """
+        return self.infer_many([(issn, year) for issn in issns])
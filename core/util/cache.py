@@ -0,0 +1,60 @@
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Cache limitado que descarta o item usado há mais tempo, com contadores de acertos e falhas.
+    """
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def get(self, key, default=None):
+        # Operações individuais do OrderedDict são atômicas; a chave pode ser descartada por outra thread entre elas
+        try:
+            value = self.data[key]
+            self.data.move_to_end(key)
+        except KeyError:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+
+        self.data.pop(key, None)
+        self.data[key] = value
+
+        if len(self.data) > self.maxsize:
+            try:
+                self.data.popitem(last=False)
+            except KeyError:
+                ...
+
+    def clear(self):
+        self.data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        requests = self.hits + self.misses
+
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / requests if requests else 0.0,
+            'size': len(self.data),
+            'maxsize': self.maxsize,
+        }
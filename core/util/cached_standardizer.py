@@ -0,0 +1,93 @@
+import json
+import logging
+import os
+
+from scielo_scholarly_data import standardizer
+from core.util.cache import LRUCache
+
+
+STANDARDIZER_CACHE_SIZE = int(os.environ.get('STANDARDIZER_CACHE_SIZE', '500000'))
+
+_MISSING = object()
+
+caches = {}
+
+
+def memoize(func):
+    """
+    Envolve uma função pura do standardizer com um cache limitado (LRUCache) registrado em caches.
+    """
+    cache = caches[func.__name__] = LRUCache(STANDARDIZER_CACHE_SIZE)
+
+    def wrapper(*args, **kwargs):
+        key = args + tuple(sorted(kwargs.items())) if kwargs else args
+
+        try:
+            value = cache.get(key, _MISSING)
+        except TypeError:
+            # Argumentos não hasheáveis (por exemplo, listas vindas do JSON) não são armazenados
+            return func(*args, **kwargs)
+
+        if value is _MISSING:
+            value = func(*args, **kwargs)
+            cache.put(key, value)
+
+        return value
+
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    wrapper.cache = cache
+
+    return wrapper
+
+
+journal_title_for_deduplication = memoize(standardizer.journal_title_for_deduplication)
+document_publication_date = memoize(standardizer.document_publication_date)
+issue_volume = memoize(standardizer.issue_volume)
+journal_issn = memoize(standardizer.journal_issn)
+
+
+def set_cache_size(size: int):
+    for cache in caches.values():
+        cache.maxsize = size
+
+        while len(cache.data) > max(size, 0):
+            cache.data.popitem(last=False)
+
+
+def stats():
+    return {name: cache.stats() for name, cache in caches.items()}
+
+
+def load_title_cache(path: str):
+    """
+    Carrega, de um arquivo JSON (título -> título normalizado), o cache de journal_title_for_deduplication.
+    """
+    if not path or not os.path.exists(path):
+        return 0
+
+    with open(path) as fin:
+        try:
+            data = json.load(fin)
+        except json.JSONDecodeError:
+            logging.warning(f'Cache de normalização de títulos em {path} é inválido e foi ignorado')
+            return 0
+
+    for title, normalized_title in data.items():
+        journal_title_for_deduplication.cache.put((title,), normalized_title)
+
+    return len(data)
+
+
+def save_title_cache(path: str):
+    """
+    Persiste o cache de journal_title_for_deduplication em um arquivo JSON (título -> título normalizado).
+    """
+    data = {k[0]: v for k, v in journal_title_for_deduplication.cache.data.items() if len(k) == 1 and isinstance(k[0], str)}
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as fout:
+        json.dump(data, fout, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+    return len(data)
@@ -0,0 +1,63 @@
+import json
+import logging
+import os
+
+
+CHECKPOINT_VERSION = 1
+
+
+def checkpoint_path(out_file: str):
+    return out_file + '.checkpoint'
+
+
+def save_checkpoint(out_file: str, in_file: str, state: dict):
+    """
+    Grava, de forma atômica, a posição alcançada no arquivo de entrada (bytes e linhas) e no arquivo de saída (bytes).
+    """
+    st = os.stat(in_file)
+
+    data = {
+        'version': CHECKPOINT_VERSION,
+        'input': os.path.abspath(in_file),
+        'input_size': st.st_size,
+        'input_mtime_ns': st.st_mtime_ns,
+        **state,
+    }
+
+    path = checkpoint_path(out_file)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as fout:
+        json.dump(data, fout)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(out_file: str, in_file: str, output_mode: str):
+    """
+    Carrega o checkpoint do arquivo de saída.
+    Retorna None se não houver checkpoint ou se ele não corresponder ao arquivo de entrada, ao modo de saída ou à saída em disco.
+    """
+    path = checkpoint_path(out_file)
+    if not os.path.exists(path):
+        return None
+
+    with open(path) as fin:
+        try:
+            data = json.load(fin)
+        except json.JSONDecodeError:
+            logging.warning(f'Checkpoint {path} é inválido e foi ignorado')
+            return None
+
+    st = os.stat(in_file)
+    if data.get('version') != CHECKPOINT_VERSION or data.get('input') != os.path.abspath(in_file) or data.get('output_mode') != output_mode:
+        logging.warning(f'Checkpoint {path} não corresponde a {in_file} no modo {output_mode} e foi ignorado')
+        return None
+
+    if data['input_size'] != st.st_size or data['input_mtime_ns'] != st.st_mtime_ns:
+        logging.warning(f'{in_file} foi modificado após o checkpoint {path}, que foi ignorado')
+        return None
+
+    if not os.path.exists(out_file) or os.path.getsize(out_file) < data['output_offset']:
+        logging.warning(f'Saída {out_file} é menor que a registrada no checkpoint {path}, que foi ignorado')
+        return None
+
+    return data
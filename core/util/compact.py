@@ -0,0 +1,107 @@
+import re
+import sys
+
+from collections.abc import Mapping
+
+
+ISSN_PATTERN = re.compile(r'\d{4}-\d{3}[\dX]')
+
+
+def issn_to_int(issn):
+    """
+    Codifica um ISSN no formato NNNN-NNNC como inteiro (sete dígitos seguidos do dígito verificador, X = 10).
+    Valores fora desse formato são mantidos como estão.
+    """
+    if isinstance(issn, str) and ISSN_PATTERN.fullmatch(issn):
+        check = issn[8]
+        return int(issn[:4] + issn[5:8]) * 11 + (10 if check == 'X' else int(check))
+
+    return issn
+
+
+def int_to_issn(code):
+    if isinstance(code, int):
+        digits, check = divmod(code, 11)
+        digits = f'{digits:07d}'
+        return f'{digits[:4]}-{digits[4:]}{"X" if check == 10 else check}'
+
+    return code
+
+
+class IssnKeyedMap(Mapping):
+    """
+    Dicionário somente leitura indexado por ISSN, armazenado com chaves codificadas como inteiros.
+    """
+
+    def __init__(self, data=None, decode_value=None):
+        self.data = data if data is not None else {}
+        self.decode_value = decode_value
+
+    def _decode(self, value):
+        return self.decode_value(value) if self.decode_value else value
+
+    def __getitem__(self, issn):
+        return self._decode(self.data[issn_to_int(issn)])
+
+    def __contains__(self, issn):
+        return issn_to_int(issn) in self.data
+
+    def __iter__(self):
+        return (int_to_issn(k) for k in self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+
+class IssnSetMap(Mapping):
+    """
+    Dicionário somente leitura chave -> conjunto de ISSNs, armazenado como frozensets internados de ISSNs codificados.
+
+    Conjuntos iguais são um único objeto; a decodificação de cada conjunto distinto é feita uma vez e reaproveitada.
+    """
+
+    def __init__(self, data=None):
+        self.data = data if data is not None else {}
+        self._decoded = {}
+
+    def _decode(self, codes):
+        decoded = self._decoded.get(codes)
+
+        if decoded is None:
+            decoded = self._decoded[codes] = frozenset(int_to_issn(c) for c in codes)
+
+        return decoded
+
+    def __getitem__(self, key):
+        return self._decode(self.data[key])
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+
+def estimate_set_map_savings(data: dict):
+    """
+    Estima quantos bytes os frozensets internados economizam em relação a um conjunto (set) distinto por chave.
+    Retorna o número de conjuntos distintos e a economia estimada.
+    """
+    set_size_by_length = {}
+    distinct = {}
+
+    total = 0
+    for codes in data.values():
+        n = len(codes)
+        if n not in set_size_by_length:
+            set_size_by_length[n] = sys.getsizeof(set(range(n)))
+        total += set_size_by_length[n]
+
+        distinct[id(codes)] = codes
+
+    compact_total = sum(sys.getsizeof(codes) for codes in distinct.values())
+
+    return len(distinct), total - compact_total
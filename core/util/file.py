@@ -5,7 +5,9 @@ import logging
 import os
 import sys
 
-from scielo_scholarly_data import standardizer
+from core.util import cached_standardizer
+from core.util.compact import IssnKeyedMap, IssnSetMap, estimate_set_map_savings, int_to_issn, issn_to_int
+from core.model.title_index import TitleBuckets
 
 
 csv.field_size_limit(sys.maxsize)
@@ -62,7 +64,7 @@ def close_files(dict_files):
             ...
 
 
-def load_title_to_issnl(path: str, sep='|'):
+def load_title_to_issnl(path: str, sep='|', buckets=False, compact=False):
     with open(path) as fin:
         title_to_issnl = {}
 
@@ -72,12 +74,19 @@ def load_title_to_issnl(path: str, sep='|'):
             title = els[0].strip()
             issnls = els[1].strip()
 
+            if compact:
+                title = sys.intern(title)
+
             title_to_issnl[title] = issnls
 
-        return title_to_issnl
+    # Agrupa títulos por primeira palavra para acelerar a correspondência inexata
+    if buckets:
+        return title_to_issnl, TitleBuckets(title_to_issnl)
+
+    return title_to_issnl
 
 
-def load_issnl_to_all(path: str, sep1='|', sep2='#'):
+def load_issnl_to_all(path: str, sep1='|', sep2='#', compact=False):
     with open(path) as fin:
         issn_to_issnl = {}
         issn_to_titles = {}
@@ -85,29 +94,39 @@ def load_issnl_to_all(path: str, sep1='|', sep2='#'):
         for line in fin:
             els = line.split(sep1)
 
-            issns = [standardizer.journal_issn(i) for i in els[3].split(sep2)]
-            issnl = standardizer.journal_issn(els[0])
+            issns = [cached_standardizer.journal_issn(i) for i in els[3].split(sep2)]
+            issnl = cached_standardizer.journal_issn(els[0])
             titles = els[4].split(sep2)
 
+            # ISSNs codificados como inteiros e títulos internados, compartilhados entre os ISSNs do registro
+            if compact:
+                issns = [issn_to_int(i) for i in issns]
+                issnl = issn_to_int(issnl)
+                titles = tuple(sys.intern(t) for t in titles)
+
             for i in issns:
                 if i not in issn_to_issnl:
                     issn_to_issnl[i] = issnl
                     issn_to_titles[i] = titles
                 else:
                     if issn_to_issnl[i] != issnl:
-                        logging.error(f'{issnl} != {issn_to_issnl[i]} para chave {i}')
+                        logging.error(f'{int_to_issn(issnl)} != {int_to_issn(issn_to_issnl[i])} para chave {int_to_issn(i)}')
+
+    if compact:
+        return IssnKeyedMap(issn_to_issnl, decode_value=int_to_issn), IssnKeyedMap(issn_to_titles)
 
     return issn_to_issnl, issn_to_titles
 
 
-def load_year_volume(path: str, data: dict, sep='|'):
+def read_year_volume(path: str, data: dict, sep='|'):
+    """
+    Lê a base título-ano-volume linha a linha, produzindo pares (chave título-ano-volume, ISSN-L).
+    """
     with open(path) as fin:
-        title_year_volume_to_issn = {}
-
         for line in fin:
             els = line.split(sep)
 
-            issn = standardizer.journal_issn(els[0])
+            issn = cached_standardizer.journal_issn(els[0])
             main_issn = data.get(issn, '') or issn
 
             title = els[1].strip()
@@ -120,15 +139,41 @@ def load_year_volume(path: str, data: dict, sep='|'):
                 volume
             ])
 
-            if mkey not in title_year_volume_to_issn:
-                title_year_volume_to_issn[mkey] = {main_issn}
-            else:
-                title_year_volume_to_issn[mkey].add(main_issn)
+            yield mkey, main_issn
+
+
+def load_year_volume(path: str, data: dict, sep='|', compact=False):
+    title_year_volume_to_issn = {}
+    interned_issn_sets = {}
+
+    for mkey, main_issn in read_year_volume(path, data, sep):
+        if compact:
+            # Conjuntos iguais de ISSNs codificados são representados por um único frozenset
+            code = issn_to_int(main_issn)
+            codes = title_year_volume_to_issn.get(mkey)
+
+            if codes is None:
+                codes = frozenset((code,))
+            elif code not in codes:
+                codes = codes | {code}
+
+            title_year_volume_to_issn[mkey] = interned_issn_sets.setdefault(codes, codes)
+
+        elif mkey not in title_year_volume_to_issn:
+            title_year_volume_to_issn[mkey] = {main_issn}
+        else:
+            title_year_volume_to_issn[mkey].add(main_issn)
+
+    if compact:
+        distinct_sets, saved_bytes = estimate_set_map_savings(title_year_volume_to_issn)
+        logging.info(f'{len(title_year_volume_to_issn)} chaves compartilham {distinct_sets} conjuntos distintos de ISSNs; economia estimada de {saved_bytes / 2 ** 20:.1f} MiB')
+
+        return IssnSetMap(title_year_volume_to_issn)
 
     return title_year_volume_to_issn
 
 
-def load_equations(path: str, sep='|'):
+def load_equations(path: str, sep='|', table=False):
     key_to_equation_params = {}
 
     if path:
@@ -139,9 +184,45 @@ def load_equations(path: str, sep='|'):
                 if row['ISSN'] not in key_to_equation_params:
                     key_to_equation_params[row['ISSN']] = (float(row['a']), float(row['b']))
 
+    # Tabela vetorizada depende de NumPy, importado apenas quando solicitada
+    if table:
+        from core.model.volume_inference import VolumeInferenceTable
+        return VolumeInferenceTable(key_to_equation_params)
+
     return key_to_equation_params
 
 
+def load_correction_bases(title_to_issnl: str, issnl_to_all: str, title_year_volume_to_issn: str, artifitial_title_year_volume_to_issn: str, equations: str, compact=False):
+    logging.info('Carregando base Title to ISSN-L...')
+    title2issnl = load_title_to_issnl(title_to_issnl, compact=compact)
+
+    logging.info('Carregando base ISSN-L to All...')
+    issn2issnl, issn2titles = load_issnl_to_all(issnl_to_all, compact=compact)
+
+    # Bases título-ano-volume não informadas (por exemplo, consultadas em índices mapeados em memória) ficam vazias
+    title_year_volume2issn = {}
+    if title_year_volume_to_issn:
+        logging.info('Carregando base Title Year Volume to ISSN...')
+        title_year_volume2issn = load_year_volume(title_year_volume_to_issn, issn2issnl, compact=compact)
+
+    artifitial_title_year_volume2issn = {}
+    if artifitial_title_year_volume_to_issn:
+        logging.info('Carregando base artificial Title Year Volume to ISSN...')
+        artifitial_title_year_volume2issn = load_year_volume(artifitial_title_year_volume_to_issn, issn2issnl, compact=compact)
+
+    logging.info('Carregando regressões lineares')
+    issn2equations = load_equations(equations)
+
+    return {
+        'title2issnl': title2issnl,
+        'issn2issnl': issn2issnl,
+        'issn2titles': issn2titles,
+        'title_year_volume2issn': title_year_volume2issn,
+        'artifitial_title_year_volume2issn': artifitial_title_year_volume2issn,
+        'issn2equations': issn2equations,
+    }
+
+
 def load_refs_from_csv(path: str, delimiter: str):
     with open(path) as fin:
         counter = 0
@@ -165,3 +246,17 @@ def load_crossref_results_dois(path: str):
                 dois.add(doi.lower())
 
     return dois
+
+
+def read_fixture_lines(path: str):
+    """
+    Lê as linhas JSON (iniciadas por {) de todos os arquivos sob path, em ordem de nome, para os scripts de benchmark.
+    """
+    lines = []
+
+    for root, dirs, files in os.walk(path):
+        for f in sorted(files):
+            with open(os.path.join(root, f), encoding='utf-8', errors='replace') as fin:
+                lines.extend(line for line in fin if line.startswith('{'))
+
+    return lines
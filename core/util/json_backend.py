@@ -0,0 +1,76 @@
+import json
+import logging
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+JSON_BACKEND = os.environ.get('JSON_BACKEND', 'json')
+
+BACKENDS = ['json', 'orjson', 'ujson']
+
+
+def _encode_object(o):
+    return o.__dict__
+
+
+def _json_dumps(obj):
+    return json.dumps(obj, default=_encode_object, sort_keys=True, ensure_ascii=False)
+
+
+def _orjson_dumps(obj):
+    return orjson.dumps(obj, default=_encode_object, option=orjson.OPT_SORT_KEYS).decode('utf-8')
+
+
+def _ujson_dumps(obj):
+    return ujson.dumps(obj, sort_keys=True, ensure_ascii=False, escape_forward_slashes=False)
+
+
+# Funções do backend em uso (definidas por set_backend)
+name = 'json'
+loads = json.loads
+dumps = _json_dumps
+JSONDecodeError = json.JSONDecodeError
+
+
+def available_backends():
+    return [b for b, module in [('json', json), ('orjson', orjson), ('ujson', ujson)] if module is not None]
+
+
+def set_backend(backend: str):
+    """
+    Define a biblioteca usada para ler e gravar citações em JSON: json (padrão), orjson ou ujson.
+
+    Somente json preserva byte a byte a saída padrão (separadores ', ' e ': '); orjson e ujson gravam JSON compacto.
+    Se a biblioteca não estiver instalada, json é usada.
+    """
+    global name, loads, dumps, JSONDecodeError
+
+    if backend not in BACKENDS:
+        raise ValueError(f'Biblioteca JSON desconhecida: {backend}')
+
+    if backend not in available_backends():
+        logging.warning(f'Biblioteca {backend} não está instalada; usando json')
+        backend = 'json'
+
+    if backend == 'orjson':
+        loads, dumps, JSONDecodeError = orjson.loads, _orjson_dumps, orjson.JSONDecodeError
+    elif backend == 'ujson':
+        loads, dumps, JSONDecodeError = ujson.loads, _ujson_dumps, ValueError
+    else:
+        loads, dumps, JSONDecodeError = json.loads, _json_dumps, json.JSONDecodeError
+
+    name = backend
+
+    return name
+
+
+set_backend(JSON_BACKEND)
@@ -0,0 +1,356 @@
+import argparse
+import heapq
+import logging
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+
+from array import array
+
+from core.util import file
+
+
+LOGGING_LEVEL = os.environ.get('LOGGING_LEVEL', logging.INFO)
+
+INDEX_MAGIC = b'CRTYVIDX'
+INDEX_VERSION = 1
+
+# Cabeçalho: identificador, versão, número de chaves, número de ISSNs e número de valores
+HEADER_FORMAT = '<8sIQQQ'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+# Seções de dados são alinhadas a 8 bytes para permitir memoryview.cast
+ALIGNMENT = 8
+
+# Número de pares chave-ISSN ordenados em memória por vez na construção do índice (cerca de 150 bytes por par)
+INDEX_RUN_SIZE = int(os.environ.get('INDEX_RUN_SIZE', '1000000'))
+INDEX_RUN_SIZE = max(INDEX_RUN_SIZE, 1)
+
+# Número máximo de arquivos temporários intercalados de uma vez; com mais blocos, a intercalação ocorre em passagens
+INDEX_MERGE_FAN_IN = int(os.environ.get('INDEX_MERGE_FAN_IN', '64'))
+INDEX_MERGE_FAN_IN = max(INDEX_MERGE_FAN_IN, 2)
+
+# Tamanho dos buffers de gravação dos arquivos temporários (em bytes e em itens de seção)
+RUN_BUFFER_SIZE = 1024 * 1024
+
+# Tamanho do buffer de leitura de cada arquivo temporário intercalado (em bytes)
+MERGE_BUFFER_SIZE = 256 * 1024
+
+# Registro dos arquivos temporários: tamanho da chave e tamanho do ISSN, seguidos de ambos
+RUN_RECORD_FORMAT = struct.Struct('<IH')
+
+
+def _padding(size):
+    return (-size) % ALIGNMENT
+
+
+def _write_strings(fout, strings):
+    blob = b''.join(strings)
+
+    offsets = array('Q', [0])
+    for s in strings:
+        offsets.append(offsets[-1] + len(s))
+
+    fout.write(offsets.tobytes())
+    fout.write(blob)
+    fout.write(b'\0' * _padding(len(blob)))
+
+
+def _write_run(records, run_path):
+    """
+    Grava pares (chave em UTF-8, ISSN) já ordenados em um arquivo temporário (registros com tamanhos prefixados).
+    """
+    with open(run_path, 'wb', buffering=RUN_BUFFER_SIZE) as fout:
+        for encoded_key, issn in records:
+            encoded_issn = issn.encode('utf-8')
+            fout.write(RUN_RECORD_FORMAT.pack(len(encoded_key), len(encoded_issn)))
+            fout.write(encoded_key)
+            fout.write(encoded_issn)
+
+    return run_path
+
+
+def _read_run(run_path):
+    with open(run_path, 'rb', buffering=MERGE_BUFFER_SIZE) as fin:
+        while True:
+            size = fin.read(RUN_RECORD_FORMAT.size)
+            if not size:
+                break
+
+            key_size, issn_size = RUN_RECORD_FORMAT.unpack(size)
+            yield fin.read(key_size), fin.read(issn_size).decode('utf-8')
+
+
+def _merge_runs(run_paths):
+    """
+    Intercala arquivos temporários ordenados, descartando pares repetidos em arquivos diferentes.
+    """
+    previous_record = None
+
+    for record in heapq.merge(*[_read_run(p) for p in run_paths]):
+        if record != previous_record:
+            yield record
+            previous_record = record
+
+
+def _reduce_runs(run_paths, run_dir, fan_in):
+    """
+    Intercala os arquivos temporários em grupos de até fan_in, em passagens sucessivas, até restarem no máximo fan_in.
+    """
+    n = len(run_paths)
+
+    while len(run_paths) > fan_in:
+        merged_paths = []
+
+        for i in range(0, len(run_paths), fan_in):
+            group = run_paths[i:i + fan_in]
+
+            if len(group) == 1:
+                merged_paths.extend(group)
+                continue
+
+            merged_paths.append(_write_run(_merge_runs(group), os.path.join(run_dir, f'run-{n:06d}')))
+            n += 1
+
+            for p in group:
+                os.remove(p)
+
+        run_paths = merged_paths
+
+    return run_paths
+
+
+def build_year_volume_index(path: str, records, run_size=INDEX_RUN_SIZE, merge_fan_in=INDEX_MERGE_FAN_IN):
+    """
+    Grava em disco um índice ordenado de chaves título-ano-volume -> ISSNs, consultável por busca binária via mmap.
+
+    records é um iterável de pares (chave título-ano-volume, ISSN), como file.read_year_volume. A construção é feita
+    por ordenação externa: blocos de até run_size pares são ordenados e gravados em arquivos temporários, depois
+    intercalados (k-way merge) em grupos de até merge_fan_in arquivos. Em memória ficam apenas um bloco, o conjunto
+    de ISSNs distintos e os buffers de leitura dos arquivos intercalados (merge_fan_in * MERGE_BUFFER_SIZE bytes).
+
+    Estrutura do arquivo (little-endian): cabeçalho; tabela de ISSNs (offsets + textos);
+    chaves ordenadas (offsets + textos em UTF-8); offsets dos valores por chave; ids de ISSN (uint32).
+    """
+    work_dir = tempfile.mkdtemp(prefix=os.path.basename(path) + '.', dir=os.path.dirname(os.path.abspath(path)))
+
+    try:
+        issns = set()
+        run_paths = []
+        records_buffer = []
+
+        for key, issn in records:
+            records_buffer.append((key.encode('utf-8'), issn))
+            issns.add(issn)
+
+            if len(records_buffer) >= run_size:
+                run_paths.append(_write_run(sorted(set(records_buffer)), os.path.join(work_dir, f'run-{len(run_paths):06d}')))
+                records_buffer = []
+
+        if records_buffer or not run_paths:
+            run_paths.append(_write_run(sorted(set(records_buffer)), os.path.join(work_dir, f'run-{len(run_paths):06d}')))
+        records_buffer = None
+
+        run_paths = _reduce_runs(run_paths, work_dir, merge_fan_in)
+
+        issns = sorted(issns)
+        issn_to_id = {i: n for n, i in enumerate(issns)}
+
+        # Seções de tamanho proporcional ao número de chaves são gravadas em arquivos à parte e concatenadas ao fim
+        sections = {name: open(os.path.join(work_dir, name), 'wb+') for name in ['key_offsets', 'keys', 'value_offsets', 'values']}
+
+        n_keys = 0
+        n_values = 0
+        key_blob_size = 0
+        key_offsets = array('Q', [0])
+        value_offsets = array('Q', [0])
+        values = array('I')
+
+        previous_key = None
+        for encoded_key, issn in _merge_runs(run_paths):
+            if encoded_key != previous_key:
+                if previous_key is not None:
+                    value_offsets.append(n_values)
+                    n_keys += 1
+
+                sections['keys'].write(encoded_key)
+                key_blob_size += len(encoded_key)
+                key_offsets.append(key_blob_size)
+                previous_key = encoded_key
+
+            values.append(issn_to_id[issn])
+            n_values += 1
+
+            if len(values) >= RUN_BUFFER_SIZE:
+                for name, data in [('key_offsets', key_offsets), ('value_offsets', value_offsets), ('values', values)]:
+                    sections[name].write(data.tobytes())
+                    del data[:]
+
+        if previous_key is not None:
+            value_offsets.append(n_values)
+            n_keys += 1
+
+        for name, data in [('key_offsets', key_offsets), ('value_offsets', value_offsets), ('values', values)]:
+            sections[name].write(data.tobytes())
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as fout:
+            fout.write(struct.pack(HEADER_FORMAT, INDEX_MAGIC, INDEX_VERSION, n_keys, len(issns), n_values))
+            fout.write(b'\0' * _padding(HEADER_SIZE))
+
+            _write_strings(fout, [i.encode('utf-8') for i in issns])
+
+            for name in ['key_offsets', 'keys', 'value_offsets', 'values']:
+                sections[name].seek(0)
+                shutil.copyfileobj(sections[name], fout, RUN_BUFFER_SIZE)
+
+                if name == 'keys':
+                    fout.write(b'\0' * _padding(key_blob_size))
+
+                sections[name].close()
+        os.replace(tmp_path, path)
+
+    finally:
+        shutil.rmtree(work_dir)
+
+    return n_keys
+
+
+class YearVolumeIndex:
+    """
+    Base título-ano-volume -> ISSNs residente em disco e mapeada em memória (mmap).
+
+    Oferece a mesma interface de leitura do dicionário produzido por file.load_year_volume
+    (in, [], get, len), de modo que processos diferentes compartilham as mesmas páginas de memória.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+        with open(path, 'rb') as fin:
+            self._mm = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic_id, version, self.n_keys, self.n_issns, n_values = struct.unpack_from(HEADER_FORMAT, self._mm, 0)
+        if magic_id != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError(f'{path} não é um índice título-ano-volume na versão {INDEX_VERSION}')
+
+        view = memoryview(self._mm)
+        pos = HEADER_SIZE + _padding(HEADER_SIZE)
+
+        self._issn_offsets, self._issn_blob_start, pos = self._read_strings(view, pos, self.n_issns)
+        self._key_offsets, self._key_blob_start, pos = self._read_strings(view, pos, self.n_keys)
+
+        self._value_offsets = view[pos:pos + (self.n_keys + 1) * 8].cast('Q')
+        pos += (self.n_keys + 1) * 8
+
+        self._values = view[pos:pos + n_values * 4].cast('I')
+
+    @staticmethod
+    def _read_strings(view, pos, n):
+        offsets = view[pos:pos + (n + 1) * 8].cast('Q')
+        blob_start = pos + (n + 1) * 8
+        blob_size = offsets[n]
+
+        return offsets, blob_start, blob_start + blob_size + _padding(blob_size)
+
+    def _key(self, i):
+        return self._mm[self._key_blob_start + self._key_offsets[i]:self._key_blob_start + self._key_offsets[i + 1]]
+
+    def _issn(self, i):
+        return self._mm[self._issn_blob_start + self._issn_offsets[i]:self._issn_blob_start + self._issn_offsets[i + 1]].decode('utf-8')
+
+    def _find(self, key: str):
+        encoded_key = key.encode('utf-8')
+
+        lo, hi = 0, self.n_keys
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < encoded_key:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        if lo < self.n_keys and self._key(lo) == encoded_key:
+            return lo
+
+        return -1
+
+    def __len__(self):
+        return self.n_keys
+
+    def __iter__(self):
+        return (self._key(i).decode('utf-8') for i in range(self.n_keys))
+
+    def __contains__(self, key):
+        return self._find(key) >= 0
+
+    def __getitem__(self, key):
+        i = self._find(key)
+
+        if i < 0:
+            raise KeyError(key)
+
+        return frozenset(self._issn(self._values[j]) for j in range(self._value_offsets[i], self._value_offsets[i + 1]))
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+def main():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        '--issnl_to_all',
+        required=True,
+        help='Base de correção ISSNL -> Metadados',
+    )
+
+    parser.add_argument(
+        '--title_year_volume_to_issn',
+        required=True,
+        help='Base de correção (real ou artificial) Título de periódico, Ano, Volume -> ISSN',
+    )
+
+    parser.add_argument(
+        '--output',
+        required=True,
+        help='Arquivo do índice título-ano-volume mapeável em memória'
+    )
+
+    parser.add_argument(
+        '--run_size',
+        type=int,
+        default=INDEX_RUN_SIZE,
+        help='Número de pares chave-ISSN ordenados em memória por vez; arquivos temporários são criados ao lado do índice'
+    )
+
+    parser.add_argument(
+        '--merge_fan_in',
+        type=int,
+        default=INDEX_MERGE_FAN_IN,
+        help='Número máximo de arquivos temporários abertos e intercalados de uma vez'
+    )
+
+    params = parser.parse_args()
+
+    logging.basicConfig(
+        level=LOGGING_LEVEL,
+        format='[%(asctime)s] %(levelname)s %(message)s',
+        datefmt='%d/%b/%Y %H:%M:%S',
+    )
+
+    logging.info('Carregando base ISSN-L to All...')
+    issn2issnl, issn2titles = file.load_issnl_to_all(params.issnl_to_all)
+
+    logging.info(f'Gravando índice da base Title Year Volume to ISSN em {params.output}...')
+    n_keys = build_year_volume_index(params.output, file.read_year_volume(params.title_year_volume_to_issn, issn2issnl), params.run_size, max(params.merge_fan_in, 2))
+    logging.info(f'Índice com {n_keys} chaves gravado em {params.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+import cProfile
+import os
+import pstats
+
+
+PROFILE_LINES = int(os.environ.get('PROFILE_LINES', '10000'))
+PROFILE_TOP = int(os.environ.get('PROFILE_TOP', '40'))
+
+SORT_KEYS = ['cumulative', 'tottime', 'ncalls']
+
+
+def profile_paths(out_file: str):
+    """
+    Caminhos do arquivo de estatísticas (pstats) e do resumo em texto de um perfil, ao lado do arquivo de saída.
+    Com saída padrão (-), são gravados no diretório atual.
+    """
+    prefix = 'enrich_references' if out_file == '-' else out_file
+    return prefix + '.prof', prefix + '.prof.txt'
+
+
+def profile_call(func, stats_path: str, summary_path: str, top=PROFILE_TOP, sort='cumulative'):
+    """
+    Executa func sob cProfile e grava as estatísticas em stats_path (legíveis por pstats, snakeviz etc.)
+    e as top funções mais custosas, ordenadas por sort, em summary_path. Devolve o resultado de func.
+    """
+    profiler = cProfile.Profile()
+
+    try:
+        result = profiler.runcall(func)
+    finally:
+        profiler.dump_stats(stats_path)
+
+        with open(summary_path, 'w') as fout:
+            stats = pstats.Stats(profiler, stream=fout)
+            stats.strip_dirs().sort_stats(sort).print_stats(top)
+
+    return result
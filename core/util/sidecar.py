@@ -0,0 +1,54 @@
+import json
+import os
+
+from core.util import stream
+
+
+SIDECAR_VERSION = 1
+
+
+def header(in_file: str, input_format: str):
+    """
+    Primeira linha do arquivo sidecar: identifica o arquivo de entrada (caminho, tamanho e data de modificação) e seu formato.
+    Para a entrada padrão, tamanho e data de modificação são nulos.
+    """
+    if in_file == stream.STDIO:
+        input_path, size, mtime_ns = in_file, None, None
+    else:
+        st = os.stat(in_file)
+        input_path, size, mtime_ns = os.path.abspath(in_file), st.st_size, st.st_mtime_ns
+
+    return json.dumps({
+        'sidecar': SIDECAR_VERSION,
+        'input': input_path,
+        'size': size,
+        'mtime_ns': mtime_ns,
+        'input_format': input_format,
+    }, ensure_ascii=False) + '\n'
+
+
+def record(line_number: int, result: dict):
+    """
+    Linha do arquivo sidecar: número da linha de entrada (a partir de 1) e campos de resultado atribuídos à citação.
+    """
+    return json.dumps({'line': line_number, **result}, separators=(',', ':'), ensure_ascii=False) + '\n'
+
+
+def read_sidecar(path: str):
+    """
+    Lê um arquivo sidecar. Retorna o cabeçalho e um gerador de pares (número da linha, campos de resultado).
+    """
+    fin = stream.open_input(path)
+
+    sidecar_header = json.loads(fin.readline() or '{}')
+    if sidecar_header.get('sidecar') != SIDECAR_VERSION:
+        fin.close()
+        raise ValueError(f'{path} não é um arquivo sidecar na versão {SIDECAR_VERSION}')
+
+    def records():
+        with fin:
+            for line in fin:
+                result = json.loads(line)
+                yield result.pop('line'), result
+
+    return sidecar_header, records()
@@ -0,0 +1,185 @@
+import argparse
+import functools
+import hashlib
+import json
+import logging
+import os
+import pickle
+import struct
+
+from core.util import file
+
+
+LOGGING_LEVEL = os.environ.get('LOGGING_LEVEL', logging.INFO)
+
+SNAPSHOT_MAGIC = b'CITEDREF'
+SNAPSHOT_VERSION = 3
+
+# Cabeçalho: identificador, versão do formato, representação das bases (1 = compacta), SHA-256 do conteúdo serializado
+# e tamanho da assinatura das bases em CSV (JSON), gravada logo após o cabeçalho e antes do conteúdo
+HEADER_FORMAT = '<8sIB32sI'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+# Tamanho dos blocos lidos no cálculo do checksum
+CHECKSUM_CHUNK_SIZE = 16 * 1024 * 1024
+
+
+def source_signature(sources: dict):
+    """
+    Obtém, para cada base de correção em CSV informada, o caminho absoluto, o tamanho e a data de modificação.
+    """
+    signature = {}
+
+    for name, path in sources.items():
+        if path:
+            st = os.stat(path)
+            signature[name] = [os.path.abspath(path), st.st_size, st.st_mtime_ns]
+
+    return signature
+
+
+def content_checksum(fin):
+    """
+    SHA-256 do conteúdo de fin a partir da posição atual, lido em blocos de CHECKSUM_CHUNK_SIZE bytes.
+    """
+    checksum = hashlib.sha256()
+
+    for chunk in iter(functools.partial(fin.read, CHECKSUM_CHUNK_SIZE), b''):
+        checksum.update(chunk)
+
+    return checksum.digest()
+
+
+def save_snapshot(path: str, bases: dict, sources: dict, compact=False):
+    signature = json.dumps(source_signature(sources)).encode('utf-8')
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w+b') as fout:
+        # Checksum ainda desconhecido: o cabeçalho é regravado após a serialização das bases
+        fout.write(struct.pack(HEADER_FORMAT, SNAPSHOT_MAGIC, SNAPSHOT_VERSION, bool(compact), bytes(32), len(signature)))
+        fout.write(signature)
+
+        content_start = fout.tell()
+        pickle.dump(bases, fout, protocol=pickle.HIGHEST_PROTOCOL)
+
+        fout.seek(content_start)
+        checksum = content_checksum(fout)
+
+        fout.seek(0)
+        fout.write(struct.pack(HEADER_FORMAT, SNAPSHOT_MAGIC, SNAPSHOT_VERSION, bool(compact), checksum, len(signature)))
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path: str, sources: dict, compact=False):
+    """
+    Carrega as bases de correção de um snapshot binário.
+    Retorna None se o snapshot não existir, for de outra versão, estiver corrompido ou desatualizado em relação aos CSVs
+    ou à representação (compacta ou não) solicitada. A atualização é verificada apenas pelo cabeçalho,
+    antes da leitura do conteúdo.
+    """
+    if not path or not os.path.exists(path):
+        logging.warning(f'Snapshot {path} não existe')
+        return None
+
+    with open(path, 'rb') as fin:
+        header = fin.read(HEADER_SIZE)
+
+        if len(header) != HEADER_SIZE:
+            logging.warning(f'Snapshot {path} é inválido')
+            return None
+
+        magic_id, version, snapshot_compact, checksum, signature_size = struct.unpack(HEADER_FORMAT, header)
+
+        if magic_id != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            logging.warning(f'Snapshot {path} tem formato ou versão ({version}) incompatível com a versão {SNAPSHOT_VERSION}')
+            return None
+
+        if bool(snapshot_compact) != bool(compact):
+            logging.warning(f'Snapshot {path} está desatualizado: bases gravadas {"com" if snapshot_compact else "sem"} --compact, solicitadas {"com" if compact else "sem"} --compact_bases')
+            return None
+
+        try:
+            signature = json.loads(fin.read(signature_size).decode('utf-8'))
+        except ValueError:
+            logging.warning(f'Snapshot {path} é inválido')
+            return None
+
+        if signature != source_signature(sources):
+            logging.warning(f'Snapshot {path} está desatualizado em relação às bases de correção em CSV')
+            return None
+
+        content_start = fin.tell()
+        if content_checksum(fin) != checksum:
+            logging.warning(f'Snapshot {path} está corrompido (checksum inválido)')
+            return None
+
+        fin.seek(content_start)
+        return pickle.load(fin)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        '--title_to_issnl',
+        required=True,
+        help='Base de correção Título de periódico -> ISSN-L',
+    )
+
+    parser.add_argument(
+        '--issnl_to_all',
+        required=True,
+        help='Base de correção ISSNL -> Metadados',
+    )
+
+    parser.add_argument(
+        '--title_year_volume_to_issn',
+        help='Base de correção Título de periódico, Ano, Volume -> ISSN; omita se o snapshot for usado com --title_year_volume_index',
+    )
+
+    parser.add_argument(
+        '--artifitial_title_year_volume_to_issn',
+        help='Base de correção artificial Título de periódico, Ano, Volume -> ISSN; omita se o snapshot for usado com --artifitial_title_year_volume_index'
+    )
+
+    parser.add_argument(
+        '--equations',
+        help='Base de correção ISSN -> Regressão Linear',
+    )
+
+    parser.add_argument(
+        '--compact',
+        action='store_true',
+        help='Grava as bases com ISSNs codificados como inteiros e conjuntos de ISSNs compartilhados'
+    )
+
+    parser.add_argument(
+        '--output',
+        default='bases.snapshot',
+        help='Arquivo de snapshot binário das bases de correção'
+    )
+
+    params = parser.parse_args()
+
+    logging.basicConfig(
+        level=LOGGING_LEVEL,
+        format='[%(asctime)s] %(levelname)s %(message)s',
+        datefmt='%d/%b/%Y %H:%M:%S',
+    )
+
+    sources = {
+        'title_to_issnl': params.title_to_issnl,
+        'issnl_to_all': params.issnl_to_all,
+        'title_year_volume_to_issn': params.title_year_volume_to_issn,
+        'artifitial_title_year_volume_to_issn': params.artifitial_title_year_volume_to_issn,
+        'equations': params.equations,
+    }
+
+    bases = file.load_correction_bases(**sources, compact=params.compact)
+
+    logging.info(f'Gravando snapshot em {params.output}...')
+    save_snapshot(params.output, bases, sources, compact=params.compact)
+
+
+if __name__ == '__main__':
+    main()
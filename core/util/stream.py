@@ -0,0 +1,113 @@
+import bz2
+import gzip
+import io
+import lzma
+import os
+import sys
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Tamanho do buffer de leitura dos arquivos de entrada (em bytes)
+READ_BUFFER_SIZE = int(os.environ.get('READ_BUFFER_SIZE', str(16 * 1024 * 1024)))
+
+# Nível de compressão das saídas gzip/xz/zstd
+COMPRESSION_LEVEL = int(os.environ.get('COMPRESSION_LEVEL', '6'))
+
+# Caminho que representa a entrada (stdin) ou a saída (stdout) padrão
+STDIO = '-'
+
+COMPRESSION_EXTENSIONS = {
+    '.gz': 'gzip',
+    '.bz2': 'bzip2',
+    '.xz': 'xz',
+    '.zst': 'zstd',
+}
+
+
+def compression(path: str):
+    """
+    Formato de compressão de um arquivo, conforme sua extensão; None para arquivos não comprimidos e stdin/stdout.
+    """
+    if path == STDIO:
+        return None
+
+    return COMPRESSION_EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+
+def split_compression_ext(path: str):
+    """
+    Separa a extensão de compressão (.gz, .bz2, .xz, .zst) do restante do caminho.
+    """
+    if compression(path):
+        return os.path.splitext(path)
+
+    return path, ''
+
+
+def is_seekable(path: str):
+    """
+    Indica se o arquivo admite posicionamento direto por bytes (necessário para checkpoints).
+    """
+    return path != STDIO and compression(path) is None
+
+
+def _open_compressed(path: str, mode: str):
+    kind = compression(path)
+
+    if kind == 'gzip':
+        return gzip.open(path, mode, compresslevel=COMPRESSION_LEVEL) if 'w' in mode else gzip.open(path, mode)
+
+    if kind == 'bzip2':
+        return bz2.open(path, mode)
+
+    if kind == 'xz':
+        return lzma.open(path, mode, preset=COMPRESSION_LEVEL) if 'w' in mode else lzma.open(path, mode)
+
+    if zstandard is None:
+        raise ValueError(f'Leitura e gravação de {path} exigem o pacote zstandard')
+
+    if 'w' in mode:
+        return zstandard.open(path, mode, cctx=zstandard.ZstdCompressor(level=COMPRESSION_LEVEL))
+
+    return zstandard.open(path, mode)
+
+
+def open_input_binary(path: str):
+    """
+    Abre para leitura binária um arquivo de entrada, stdin (STDIO) ou arquivo comprimido, descomprimido de forma transparente.
+    """
+    if path == STDIO:
+        return open(sys.stdin.fileno(), 'rb', buffering=READ_BUFFER_SIZE, closefd=False)
+
+    if compression(path):
+        return io.BufferedReader(_open_compressed(path, 'rb'), buffer_size=READ_BUFFER_SIZE)
+
+    return open(path, 'rb', buffering=READ_BUFFER_SIZE)
+
+
+def open_input(path: str, encoding: str = None):
+    """
+    Abre para leitura em modo texto um arquivo de entrada, stdin (STDIO) ou arquivo comprimido, com buffer de READ_BUFFER_SIZE bytes.
+    """
+    if path == STDIO or compression(path):
+        return io.TextIOWrapper(open_input_binary(path), encoding=encoding)
+
+    return open(path, encoding=encoding, buffering=READ_BUFFER_SIZE)
+
+
+def open_output(path: str, mode: str = 'w'):
+    """
+    Abre para gravação em modo texto um arquivo de saída, stdout (STDIO) ou arquivo comprimido conforme a extensão.
+    """
+    if path == STDIO:
+        sys.stdout.flush()
+        return open(sys.stdout.fileno(), 'w', closefd=False)
+
+    if compression(path):
+        return io.TextIOWrapper(_open_compressed(path, mode.replace('t', '') + 'b'))
+
+    return open(path, mode)
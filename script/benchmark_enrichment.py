@@ -0,0 +1,400 @@
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing as mp
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.getcwd())
+
+from core.matchers.enrich_references import EnrichmentEngine, extract_essential_data, read_chunks
+from core.model.citation import Citation
+from core.util import cached_standardizer as standardizer
+from core.util.file import read_fixture_lines
+
+
+# Nomes dos arquivos das bases sintéticas
+BASE_FILES = {
+    'title_to_issnl': 'title_to_issnl.csv',
+    'issnl_to_all': 'issnl_to_all.csv',
+    'title_year_volume_to_issn': 'title_year_volume_to_issn.csv',
+    'artifitial_title_year_volume_to_issn': 'artifitial_title_year_volume_to_issn.csv',
+    'equations': 'equations.csv',
+}
+
+# Variação absoluta (em segundos) do tempo de carga das bases tolerada além da relativa
+MIN_LOAD_DELTA = 0.25
+
+MODES = {
+    'exact': False,
+    'fuzzy': True,
+}
+
+
+def random_issn(rng):
+    digits = [rng.randint(0, 9) for _ in range(7)]
+    check = (11 - sum(d * w for d, w in zip(digits, range(8, 1, -1))) % 11) % 11
+
+    return '{}{}{}{}-{}{}{}'.format(*digits) + ('X' if check == 10 else str(check))
+
+
+def fit_equation(points):
+    """
+    Regressão linear volume = a + b * ano pelos mínimos quadrados, como em generate_equations.
+    """
+    n = len(points)
+    mean_x = sum(x for x, y in points) / n
+    mean_y = sum(y for x, y in points) / n
+
+    sxx = sum((x - mean_x) ** 2 for x, y in points)
+    if sxx == 0:
+        return None
+
+    b = sum((x - mean_x) * (y - mean_y) for x, y in points) / sxx
+    return mean_y - b * mean_x, b
+
+
+def generate_bases(lines, bases_dir, synthetic_titles=100000, homonym_ratio=0.05, volumes_per_title=5, seed=1):
+    """
+    Gera bases de correção sintéticas a partir das citações: cada título normalizado recebe um ISSN-L (o informado
+    na citação, se houver) e seus trios título-ano-volume compõem as bases real e artificial; títulos sintéticos,
+    formados com as palavras dos títulos reais, completam o tamanho da base. Uma fração dos títulos recebe ISSN-Ls
+    adicionais (homônimos), em sua maioria um, às vezes dois ou três.
+    """
+    rng = random.Random(seed)
+
+    title_to_issn = {}
+    issn_to_titles = {}
+    tyv_records = set()
+
+    for line in lines:
+        cit = Citation(line)
+        title, year, volume = extract_essential_data(cit)
+        if not title:
+            continue
+
+        if title not in title_to_issn:
+            raw_issn = cit.__dict__.get('sb_cited_issn') or cit.__dict__.get('cited_issnl')
+            issn = standardizer.journal_issn(raw_issn) if raw_issn else None
+            title_to_issn[title] = issn or random_issn(rng)
+
+        issn = title_to_issn[title]
+        issn_to_titles.setdefault(issn, set()).add(title)
+
+        if year.isdigit() and volume:
+            tyv_records.add((issn, title, year, volume))
+
+    words = sorted({w for t in title_to_issn for w in t.split()})
+    for _ in range(synthetic_titles):
+        title = ' '.join(rng.choice(words) for _ in range(rng.randint(2, 5)))
+        if title in title_to_issn:
+            continue
+
+        issn = random_issn(rng)
+        title_to_issn[title] = issn
+        issn_to_titles.setdefault(issn, set()).add(title)
+
+        first_year = rng.randint(1950, 2015)
+        for v in range(volumes_per_title):
+            tyv_records.add((issn, title, str(first_year + v), str(v + 1)))
+
+    all_issns = sorted(issn_to_titles)
+    title_to_issnls = {}
+
+    for title in sorted(title_to_issn):
+        issnls = [title_to_issn[title]]
+
+        if rng.random() < homonym_ratio:
+            issnls.extend(rng.sample(all_issns, rng.choice([1, 1, 1, 2, 3])))
+
+        title_to_issnls[title] = sorted(set(issnls))
+
+    issn_to_points = {}
+    for issn, title, year, volume in tyv_records:
+        if volume.isdigit():
+            issn_to_points.setdefault(issn, set()).add((int(year), int(volume)))
+
+    os.makedirs(bases_dir, exist_ok=True)
+    paths = {k: os.path.join(bases_dir, v) for k, v in BASE_FILES.items()}
+
+    with open(paths['title_to_issnl'], 'w') as fout:
+        for title, issnls in title_to_issnls.items():
+            fout.write(f'{title}|{"#".join(issnls)}|\n')
+
+    with open(paths['issnl_to_all'], 'w') as fout:
+        for issn in all_issns:
+            fout.write(f'{issn}|||{issn}|{"#".join(sorted(issn_to_titles[issn]))}|\n')
+
+    # Dois terços dos trios vão para a base real e um terço para a artificial
+    with open(paths['title_year_volume_to_issn'], 'w') as freal, open(paths['artifitial_title_year_volume_to_issn'], 'w') as fart:
+        for n, record in enumerate(sorted(tyv_records)):
+            (fart if n % 3 == 0 else freal).write('|'.join(record) + '\n')
+
+    with open(paths['equations'], 'w') as fout:
+        fout.write('ISSN|a|b|r2\n')
+
+        for issn, points in sorted(issn_to_points.items()):
+            equation = fit_equation(sorted(points)) if len({x for x, y in points}) >= 3 else None
+
+            if equation is not None:
+                fout.write(f'{issn}|{equation[0]}|{equation[1]}|\n')
+
+    return {
+        'titles': len(title_to_issnls),
+        'homonymous_titles': sum(1 for issnls in title_to_issnls.values() if len(issnls) > 1),
+        'issns': len(all_issns),
+        'title_year_volume_records': len(tyv_records),
+        'equations': sum(1 for points in issn_to_points.values() if len({x for x, y in points}) >= 3),
+    }
+
+
+def peak_rss_kb():
+    # No Linux, ru_maxrss é herdado do processo pai através de fork e exec; VmHWM mede apenas o processo atual
+    try:
+        with open('/proc/self/status') as fin:
+            for line in fin:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        ...
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_mode(bases_dir, fixtures, use_fuzzy, chunk_size):
+    """
+    Executado em um processo novo (spawn) para que o pico de memória medido seja apenas o desta execução.
+    """
+    logging.basicConfig(level=logging.WARNING)
+
+    paths = {k: os.path.join(bases_dir, v) for k, v in BASE_FILES.items()}
+
+    start = time.perf_counter()
+    engine = EnrichmentEngine.from_files(**paths, use_fuzzy=use_fuzzy, chunk_size=chunk_size)
+    load_elapsed = time.perf_counter() - start
+    load_rss = peak_rss_kb()
+
+    lines = read_fixture_lines(fixtures)
+
+    # Resumo da saída, para detectar mudanças de resultado entre execuções
+    digest = hashlib.sha1()
+
+    start = time.perf_counter()
+    for chunk in read_chunks(lines, engine.chunk_size):
+        for output_line in engine.enrich_lines(chunk):
+            digest.update(output_line.encode('utf-8'))
+    elapsed = time.perf_counter() - start
+
+    return {
+        'lines': len(lines),
+        'load_elapsed': load_elapsed,
+        'elapsed': elapsed,
+        'lines_per_second': len(lines) / elapsed,
+        'load_peak_rss_kb': load_rss,
+        'peak_rss_kb': peak_rss_kb(),
+        'result_codes': {str(k): v for k, v in sorted(engine.collect_metrics()['result_codes'].items())},
+        'output_sha1': digest.hexdigest(),
+    }
+
+
+def measure(bases_dir, fixtures, use_fuzzy, chunk_size, repeat):
+    """
+    Executa o modo repeat vezes, cada uma em um processo novo, e mantém a execução mais rápida.
+    """
+    best = None
+
+    for r in range(repeat):
+        with mp.get_context('spawn').Pool(1) as pool:
+            result = pool.apply(run_mode, (bases_dir, fixtures, use_fuzzy, chunk_size))
+
+        if best is None or result['elapsed'] < best['elapsed']:
+            best = result
+
+    return best
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compara os resultados com os de referência; devolve as regressões encontradas.
+    """
+    regressions = []
+
+    for mode, result in results.items():
+        reference = baseline.get('modes', {}).get(mode)
+        if reference is None:
+            continue
+
+        if result['lines_per_second'] < reference['lines_per_second'] * (1 - tolerance):
+            regressions.append(f'{mode}: vazão caiu de {reference["lines_per_second"]:.0f} para {result["lines_per_second"]:.0f} linhas/s')
+
+        if result['peak_rss_kb'] > reference['peak_rss_kb'] * (1 + tolerance):
+            regressions.append(f'{mode}: pico de memória subiu de {reference["peak_rss_kb"] / 1024:.1f} para {result["peak_rss_kb"] / 1024:.1f} MB')
+
+        # Cargas curtas oscilam mais que a tolerância relativa; diferenças abaixo de MIN_LOAD_DELTA são ignoradas
+        if result['load_elapsed'] > reference['load_elapsed'] * (1 + tolerance) + MIN_LOAD_DELTA:
+            regressions.append(f'{mode}: carga das bases passou de {reference["load_elapsed"]:.2f} para {result["load_elapsed"]:.2f}s')
+
+        if result['output_sha1'] != reference['output_sha1']:
+            regressions.append(f'{mode}: saída diferente da de referência (códigos de resultado {reference["result_codes"]} -> {result["result_codes"]})')
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        '--fixtures',
+        default='tests/fixtures',
+        help='Diretório com arquivos de citações em JSON (uma por linha)'
+    )
+
+    parser.add_argument(
+        '--bases_dir',
+        help='Diretório em que as bases sintéticas são geradas e mantidas (por padrão, um diretório temporário)'
+    )
+
+    parser.add_argument(
+        '--synthetic_titles',
+        type=int,
+        default=100000,
+        help='Número de títulos sintéticos acrescentados aos títulos das citações'
+    )
+
+    parser.add_argument(
+        '--homonym_ratio',
+        type=float,
+        default=0.05,
+        help='Fração dos títulos associados a mais de um ISSN-L'
+    )
+
+    parser.add_argument(
+        '--volumes_per_title',
+        type=int,
+        default=5,
+        help='Número de trios título-ano-volume de cada título sintético'
+    )
+
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=1,
+        help='Semente das bases sintéticas'
+    )
+
+    parser.add_argument(
+        '--modes',
+        nargs='+',
+        default=list(MODES),
+        choices=list(MODES),
+        help='Modos de correspondência avaliados: exact (apenas exata) e fuzzy (exata e inexata)'
+    )
+
+    parser.add_argument(
+        '--chunk_size',
+        type=int,
+        default=1000,
+        help='Número de linhas por bloco de enriquecimento'
+    )
+
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=1,
+        help='Número de repetições de cada modo; a mais rápida é considerada'
+    )
+
+    parser.add_argument(
+        '--save_baseline',
+        help='Arquivo JSON em que os resultados são gravados como referência'
+    )
+
+    parser.add_argument(
+        '--baseline',
+        help='Arquivo JSON de referência (gravado com --save_baseline) com o qual os resultados são comparados'
+    )
+
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=0.1,
+        help='Variação relativa tolerada em vazão, memória e tempo de carga antes de acusar regressão'
+    )
+
+    params = parser.parse_args()
+
+    # Saída comparável entre execuções (ordem de conjuntos), herdada pelos processos de medição
+    os.environ['PYTHONHASHSEED'] = '0'
+
+    bases_dir = params.bases_dir or tempfile.mkdtemp(prefix='benchmark_enrichment_')
+    generation_params = {
+        'synthetic_titles': params.synthetic_titles,
+        'homonym_ratio': params.homonym_ratio,
+        'volumes_per_title': params.volumes_per_title,
+        'seed': params.seed,
+    }
+
+    lines = read_fixture_lines(params.fixtures)
+    print(f'{len(lines)} citações em {params.fixtures}')
+
+    start = time.perf_counter()
+    bases_stats = generate_bases(lines, bases_dir, **generation_params)
+    print(f'Bases sintéticas geradas em {bases_dir} em {time.perf_counter() - start:.1f}s: ' + ', '.join(f'{k}={v}' for k, v in bases_stats.items()))
+    del lines
+
+    results = {}
+    print(f'{"modo":<8} {"carga":>8} {"enriquecimento":>15} {"linhas/s":>10} {"RSS carga":>10} {"RSS pico":>10}  saída')
+
+    try:
+        for mode in params.modes:
+            result = measure(bases_dir, params.fixtures, MODES[mode], params.chunk_size, params.repeat)
+            results[mode] = result
+
+            print(f'{mode:<8} {result["load_elapsed"]:7.2f}s {result["elapsed"]:14.2f}s {result["lines_per_second"]:10.0f} {result["load_peak_rss_kb"] / 1024:8.1f}MB {result["peak_rss_kb"] / 1024:8.1f}MB  {result["output_sha1"][:12]}')
+
+    # Bases geradas em diretório temporário são descartadas ao fim
+    finally:
+        if not params.bases_dir:
+            shutil.rmtree(bases_dir)
+
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': sys.version.split()[0],
+        'fixtures': params.fixtures,
+        'bases': {**generation_params, **bases_stats},
+        'chunk_size': params.chunk_size,
+        'modes': results,
+    }
+
+    if params.save_baseline:
+        with open(params.save_baseline, 'w') as fout:
+            json.dump(report, fout, indent=2)
+            fout.write('\n')
+
+        print(f'Resultados de referência gravados em {params.save_baseline}')
+
+    if params.baseline:
+        with open(params.baseline) as fin:
+            baseline = json.load(fin)
+
+        if baseline.get('bases', {}) != report['bases'] or baseline.get('chunk_size') != params.chunk_size:
+            print('Aviso: bases sintéticas ou tamanho de bloco diferentes dos da referência')
+
+        regressions = compare(results, baseline, params.tolerance)
+        for regression in regressions:
+            print(f'Regressão: {regression}')
+
+        if regressions:
+            sys.exit(1)
+
+        print(f'Sem regressões em relação a {params.baseline} (tolerância de {params.tolerance:.0%})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.getcwd())
+
+from core.model.citation import Citation
+from core.util import json_backend
+from core.util.file import read_fixture_lines
+
+
+class LegacyCitation:
+    """
+    Leitura e gravação de citações como eram feitas antes do backend JSON configurável (setattr por atributo).
+    """
+
+    def __init__(self, data):
+        try:
+            json_data = json.loads(data)
+        except json.JSONDecodeError:
+            json_data = {'error': 'it was not possible to load the citation'}
+
+        for k in json_data.keys():
+            setattr(self, k, json_data[k])
+
+    def to_json(self):
+        return json.dumps(self, default=lambda o: o.__dict__, sort_keys=True, ensure_ascii=False)
+
+
+def measure(lines, load_and_dump, repeat):
+    best = None
+    outputs = None
+
+    for r in range(repeat):
+        start = time.perf_counter()
+        outputs = [load_and_dump(line) for line in lines]
+        elapsed = time.perf_counter() - start
+
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        '--fixtures',
+        default='tests/fixtures',
+        help='Diretório com arquivos de citações em JSON (uma por linha)'
+    )
+
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=3,
+        help='Número de repetições; o menor tempo é considerado'
+    )
+
+    params = parser.parse_args()
+
+    lines = read_fixture_lines(params.fixtures)
+    print(f'{len(lines)} citações em {params.fixtures}')
+
+    legacy_time, legacy_outputs = measure(lines, lambda line: LegacyCitation(line).to_json(), params.repeat)
+    print(f'{"legado":<8} {legacy_time:8.3f}s {len(lines) / legacy_time:12.0f} linhas/s')
+
+    for backend in json_backend.available_backends():
+        json_backend.set_backend(backend)
+
+        backend_time, outputs = measure(lines, lambda line: Citation(line).to_json(), params.repeat)
+        identical = 'idêntica' if outputs == legacy_outputs else 'diferente'
+
+        print(f'{backend:<8} {backend_time:8.3f}s {len(lines) / backend_time:12.0f} linhas/s  {legacy_time / backend_time:5.2f}x  saída {identical}')
+
+    json_backend.set_backend(json_backend.JSON_BACKEND)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+import argparse
+import filecmp
+import logging
+import os
+import sys
+import tempfile
+
+sys.path.append(os.getcwd())
+
+from core.matchers import enrich_references
+from core.matchers.join_sidecar import join_sidecar
+
+
+def check_sidecar_join(in_file, engine, work_dir):
+    """
+    Enriquece in_file no modo full e no modo sidecar seguido de join_sidecar; devolve os caminhos das duas saídas
+    e se são idênticas byte a byte.
+    """
+    full_file = os.path.join(work_dir, 'full.jsonl')
+    sidecar_file = os.path.join(work_dir, 'sidecar.jsonl')
+    joined_file = os.path.join(work_dir, 'joined.jsonl')
+
+    enrich_references.enrich_file(in_file, full_file, engine, chunk_size=engine.chunk_size)
+    enrich_references.enrich_file(in_file, sidecar_file, engine, chunk_size=engine.chunk_size, output_mode='sidecar')
+    join_sidecar(in_file, sidecar_file, joined_file)
+
+    return full_file, joined_file, filecmp.cmp(full_file, joined_file, shallow=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Verifica se a saída do modo full é idêntica à do modo sidecar unido por join-sidecar')
+
+    enrich_references.add_engine_arguments(parser)
+
+    parser.add_argument(
+        '--input',
+        nargs='+',
+        required=True,
+        help='Arquivos de entrada verificados'
+    )
+
+    parser.add_argument(
+        '--work_dir',
+        help='Diretório em que as saídas são mantidas (por padrão, um diretório temporário descartado ao fim)'
+    )
+
+    params = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    engine = enrich_references.build_engine(params)
+    differences = 0
+
+    for in_file in params.input:
+        with tempfile.TemporaryDirectory(prefix='check_sidecar_join_') as tmp_dir:
+            work_dir = tmp_dir
+            if params.work_dir:
+                work_dir = os.path.join(params.work_dir, os.path.basename(in_file))
+                os.makedirs(work_dir, exist_ok=True)
+
+            full_file, joined_file, identical = check_sidecar_join(in_file, engine, work_dir)
+
+        if identical:
+            print(f'{in_file}: saídas idênticas')
+        else:
+            differences += 1
+            print(f'{in_file}: saídas diferentes' + (f' ({full_file} e {joined_file})' if params.work_dir else '; use --work_dir para mantê-las'))
+
+    if differences:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
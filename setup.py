@@ -3,7 +3,7 @@ from setuptools import setup, find_packages
 
 
 install_requires = [
-    'aiohttp',
+    'aiohttp>=3.14,<4',
     'articlemetaapi',
     'async-timeout',
     'beautifulsoup4',
@@ -11,7 +11,6 @@ install_requires = [
     'certifi',
     'chardet',
     'idna',
-    'idna-ssl',
     'legendarium',
     'multidict',
     'ply',
@@ -26,6 +25,10 @@ install_requires = [
     'scielo_scholarly_data',
 ]
 
+extras_require = {
+    'inference': ['numpy'],
+}
+
 setup(
     name="cited-references",
     version='0.5',
@@ -37,9 +40,14 @@ setup(
     maintainer_email='rafael.pezzuto@gmail.com',
     packages=find_packages(),
     install_requires=install_requires,
+    extras_require=extras_require,
     entry_points="""
     [console_scripts]
     clean-elsevier=core.cleaners.elsevier:main
+    compile-bases=core.util.snapshot:main
+    compile-year-volume-index=core.util.mmap_index:main
+    enrich-server=core.matchers.enrich_server:main
+    join-sidecar=core.matchers.join_sidecar:main
     match=core.matchers.match:main
     scrap-latindex=core.scrappers.latindex:main
     scrap-scielo=core.scrappers.scielo:main
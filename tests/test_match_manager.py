@@ -0,0 +1,170 @@
+import json
+import os
+import unittest
+
+from core.matchers.enrich_references import build_homonym_table
+from core.matchers.result_code import *
+from core.model.match_manager import DEFAULT_STAGE_ORDER, MatchManager
+from core.model.title_index import TitleIndex
+from core.util import file
+
+
+# Códigos de resultado das etapas de desambiguação na correspondência exata
+STAGE_RESULT_CODES = {
+    'year_volume': {SUCCESS_EXACT_MATCH_YEAR_VOL},
+    'inferred': {SUCCESS_EXACT_MATCH_YEAR_VOL_INF, ERROR_EXACT_MATCH_YEAR_VOL_INF},
+    'artificial': {SUCCESS_EXACT_MATCH_YEAR_VOL_ART},
+    'artificial_inferred': {SUCCESS_EXACT_MATCH_YEAR_VOL_INF_ART, ERROR_EXACT_MATCH_YEAR_VOL_INF_ART},
+}
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'match_manager')
+
+# Ordens de etapas comparadas, incluindo etapas omitidas e a etapa fuzzy antes ou entre as de desambiguação
+STAGE_ORDERS = [
+    DEFAULT_STAGE_ORDER,
+    ['exact', 'year_volume'],
+    ['exact', 'inferred'],
+    ['exact', 'artificial_inferred', 'year_volume'],
+    ['exact', 'artificial', 'fuzzy', 'inferred'],
+    ['fuzzy', 'exact', 'year_volume', 'inferred'],
+    ['exact', 'fuzzy', 'artificial_inferred', 'artificial', 'inferred', 'year_volume'],
+]
+
+
+def load_bases():
+    return file.load_correction_bases(
+        os.path.join(FIXTURES_DIR, 'title_to_issnl.csv'),
+        os.path.join(FIXTURES_DIR, 'issnl_to_all.csv'),
+        os.path.join(FIXTURES_DIR, 'title_year_volume_to_issn.csv'),
+        os.path.join(FIXTURES_DIR, 'artifitial_title_year_volume_to_issn.csv'),
+        os.path.join(FIXTURES_DIR, 'equations.csv'),
+    )
+
+
+def build_match_manager(bases, **kwargs):
+    return MatchManager(
+        bases['title2issnl'],
+        bases['issn2titles'],
+        bases['title_year_volume2issn'],
+        bases['artifitial_title_year_volume2issn'],
+        bases['issn2equations'],
+        **kwargs
+    )
+
+
+def homonym_queries(bases):
+    """
+    Trios título-ano-volume dos títulos homônimos: chaves das bases, volumes vizinhos, volume ausente e anos sem chave.
+    """
+    homonymous = {t for t, issnls in bases['title2issnl'].items() if '#' in issnls}
+    queries = set()
+
+    for base in [bases['title_year_volume2issn'], bases['artifitial_title_year_volume2issn']]:
+        for key in base:
+            title, year, volume = key.rsplit('-', 2)
+            if title in homonymous:
+                queries.update((title, year, v) for v in [volume, str(int(volume) + 1), ''])
+
+    for title in homonymous:
+        queries.update((title, year, '1') for year in ['', 's.d.', '1950', '2010'])
+
+    return sorted(queries)
+
+
+class HomonymTableTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.bases = load_bases()
+        cls.queries = homonym_queries(cls.bases)
+
+    def test_table_matches_stage_chain(self):
+        for stage_order in STAGE_ORDERS:
+            with self.subTest(stage_order=stage_order):
+                homonym_table = build_homonym_table(
+                    self.bases['title2issnl'],
+                    self.bases['title_year_volume2issn'],
+                    self.bases['artifitial_title_year_volume2issn'],
+                    self.bases['issn2equations'],
+                    stage_order,
+                )
+
+                chain = build_match_manager(self.bases, use_fuzzy=True, stage_order=stage_order)
+                table = build_match_manager(self.bases, use_fuzzy=True, stage_order=stage_order, homonym_table=homonym_table)
+
+                for query in self.queries:
+                    self.assertEqual(table.match(*query), chain.match(*query), query)
+
+    def test_queries_cover_all_stages(self):
+        # Sem decisões de todas as etapas, a comparação acima não exercitaria a tabela
+        chain = build_match_manager(self.bases)
+        result_codes = {chain.match(*query)['result_code'] for query in self.queries}
+
+        for stage in DEFAULT_STAGE_ORDER[2:]:
+            with self.subTest(stage=stage):
+                self.assertTrue(result_codes & STAGE_RESULT_CODES[stage])
+
+
+    def test_rejects_table_built_for_other_stages(self):
+        homonym_table = build_homonym_table(
+            self.bases['title2issnl'],
+            self.bases['title_year_volume2issn'],
+            self.bases['artifitial_title_year_volume2issn'],
+            self.bases['issn2equations'],
+            ['exact', 'year_volume', 'inferred'],
+        )
+
+        build_match_manager(self.bases, stage_order=['exact', 'fuzzy', 'year_volume', 'inferred'], homonym_table=homonym_table)
+
+        for stage_order in [DEFAULT_STAGE_ORDER, ['exact', 'inferred', 'year_volume'], ['exact', 'year_volume']]:
+            with self.subTest(stage_order=stage_order):
+                with self.assertRaises(ValueError):
+                    build_match_manager(self.bases, stage_order=stage_order, homonym_table=homonym_table)
+
+        manager = build_match_manager(self.bases, homonym_table=homonym_table, stage_order=['exact', 'year_volume', 'inferred'])
+        with self.assertRaises(ValueError):
+            manager.set_stage_order(['exact', 'inferred'])
+
+
+class LegacyMatchTest(unittest.TestCase):
+    """
+    Compara MatchManager com os resultados da função enrich anterior às etapas de correspondência
+    (legacy_results.jsonl, trios já normalizados). Trios cuja chave título-ano-volume dependia da ordem
+    de iteração de conjuntos (PYTHONHASHSEED) foram excluídos da fixture.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.bases = load_bases()
+
+        with open(os.path.join(FIXTURES_DIR, 'legacy_results.jsonl')) as fin:
+            cls.records = [json.loads(line) for line in fin]
+
+    def assert_matches_legacy(self, managers):
+        for record in self.records:
+            manager = managers[record['use_fuzzy']]
+            query = (record['title'], record['year'], record['volume'])
+            self.assertEqual(manager.match(*query), record['result'], query)
+
+    def test_stage_chain(self):
+        self.assert_matches_legacy({
+            False: build_match_manager(self.bases),
+            True: build_match_manager(self.bases, use_fuzzy=True),
+        })
+
+    def test_title_index_and_homonym_table(self):
+        homonym_table = build_homonym_table(
+            self.bases['title2issnl'],
+            self.bases['title_year_volume2issn'],
+            self.bases['artifitial_title_year_volume2issn'],
+            self.bases['issn2equations'],
+        )
+
+        self.assert_matches_legacy({
+            False: build_match_manager(self.bases, homonym_table=homonym_table),
+            True: build_match_manager(self.bases, use_fuzzy=True, title_index=TitleIndex(self.bases['title2issnl']), homonym_table=homonym_table),
+        })
+
+
+if __name__ == '__main__':
+    unittest.main()